@@ -0,0 +1,112 @@
+import gc
+import sys
+import time
+import random
+import tracemalloc
+from datetime import datetime, timedelta
+from book import Book
+from library import Library
+
+
+CATEGORIES = ['Uncategorized', 'Manga', 'Novels', 'Comics', 'Magazines', 'Technical', 'Art', 'Archive']
+
+
+def synthetic_books(count, seed=0):
+    """Plain book dicts shaped like bookshelf.json entries (as parsed from JSON: no shared strings)"""
+    rng = random.Random(seed)
+    start = datetime(2018, 1, 1)
+    books = []
+    for i in range(count):
+        added = start + timedelta(seconds=rng.randrange(200_000_000), microseconds=rng.randrange(1_000_000))
+        opened = added + timedelta(seconds=rng.randrange(10_000_000)) if rng.random() < 0.6 else None
+        favorites = [{'id': f"fav_{i}_{n}", 'page': rng.randrange(300), 'name': f"Page {n}",
+                      'created_date': added.isoformat()} for n in range(rng.choice((0, 0, 0, 1, 2)))]
+        books.append({
+            'id': f"book_{i}_{rng.randrange(10**6)}",
+            'title': f"Synthetic Book {i:06d}",
+            'path': f"/library/shelf_{i % 97}/book_{i:06d}.pdf",
+            'filename': f"book_{i:06d}.pdf",
+            'pages': rng.randrange(20, 600),
+            'added_date': added.isoformat(),
+            'last_opened': opened.isoformat() if opened else None,
+            'last_page': rng.randrange(20),
+            'thumbnail_page': 0,
+            'reading_direction': ''.join(rng.choice(('left_to_right', 'right_to_left'))),
+            'category': ''.join(rng.choice(CATEGORIES)),  # join: a fresh string per book, like json.load
+            'custom_order': i,
+            'favorite_pages': favorites,
+        })
+    return books
+
+
+def measure_memory(build):
+    gc.collect()
+    tracemalloc.start()
+    records = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return records, size
+
+
+def best_time(function, repeat=5):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    source = synthetic_books(count)
+
+    # Both sides get their own favorites (as records loaded from JSON or the store do)
+    def own_favorites(book):
+        return [dict(favorite) for favorite in book['favorite_pages']]
+
+    dicts, dict_bytes = measure_memory(lambda: [dict(book, favorite_pages=own_favorites(book))
+                                                for book in source])
+    books, book_bytes = measure_memory(lambda: [Book(dict(book, favorite_pages=own_favorites(book)))
+                                                for book in source])
+
+    lossless = all(book.to_dict() == data for book, data in zip(books, source))
+
+    # Sort keys of the shelf's sort modes, before and after Book
+    sorts = [
+        ('recent', lambda: sorted(dicts, key=lambda x: (x['last_opened'] or '1900-01-01T00:00:00',
+                                                        x['added_date']), reverse=True),
+                   lambda: sorted(books, key=lambda x: (x.last_opened_us or 0, x.added_us or 0), reverse=True)),
+        ('added', lambda: sorted(dicts, key=lambda x: x['added_date'], reverse=True),
+                  lambda: sorted(books, key=lambda x: x.added_us or 0, reverse=True)),
+        ('title', lambda: sorted(dicts, key=lambda x: x['title'].lower()),
+                  lambda: sorted(books, key=lambda x: x.title.lower())),
+    ]
+
+    print(f"{count} books, Python {sys.version.split()[0]}")
+    print(f"memory  dict {dict_bytes / 2**20:8.1f} MB   Book {book_bytes / 2**20:8.1f} MB   "
+          f"({1 - book_bytes / dict_bytes:.0%} less)")
+    for mode, sort_dicts, sort_books in sorts:
+        dict_time = best_time(sort_dicts)
+        book_time = best_time(sort_books)
+        print(f"sort {mode:7} dict {dict_time * 1000:8.1f} ms   Book {book_time * 1000:8.1f} ms")
+    print(f"round trip to_dict() == source: {lossless}")
+
+    # Ordered views and the query cache (what refresh_bookshelf asks for)
+    library = Library(source)
+    first = best_time(lambda: library.query('', None, 'recent'), repeat=1)
+    cached = best_time(lambda: library.query('', None, 'recent'))
+    ids = [book['id'] for book in source]
+    rng = random.Random(1)
+
+    def turn_and_query():
+        library.update(rng.choice(ids), last_opened=datetime.now().isoformat())
+        library.query('', None, 'recent')
+    changed = best_time(turn_and_query)
+    print(f"query recent  first {first * 1000:6.1f} ms   cached {cached * 1000:6.1f} ms   "
+          f"after one update {changed * 1000:6.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
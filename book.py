@@ -0,0 +1,184 @@
+import sys
+from datetime import datetime, timedelta
+from types import MappingProxyType
+
+
+# Record keys in the order they are written out (bookshelf.json, profiles)
+KEY_ORDER = (
+    'id', 'title', 'path', 'filename', 'pages', 'added_date', 'last_opened',
+    'last_page', 'thumbnail_page', 'reading_direction', 'category', 'custom_order',
+    'favorite_pages', 'cover_preview'
+)
+
+# Timestamps are ISO strings in JSON and integer microseconds in memory
+DATE_FIELDS = {'added_date': 'added_us', 'last_opened': 'last_opened_us'}
+SLOT_FIELDS = tuple(key for key in KEY_ORDER if key not in DATE_FIELDS)
+SLOT_SET = frozenset(SLOT_FIELDS)
+INTERNED_FIELDS = ('category', 'reading_direction')  # Few distinct values, shared strings
+
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+
+
+def iso_to_us(text):
+    """Microseconds since 1970 for an ISO timestamp (naive local times stay naive)"""
+    moment = datetime.fromisoformat(text)
+    if moment.tzinfo is not None:
+        moment = (moment - moment.utcoffset()).replace(tzinfo=None)
+    return (moment - EPOCH) // MICROSECOND
+
+
+def us_to_iso(us):
+    return (EPOCH + us * MICROSECOND).isoformat()
+
+
+class Book:
+    """Compact record for one book on the shelf.
+
+    Known fields live in __slots__; added_date and last_opened are kept as
+    integer microseconds (added_us, last_opened_us) so sorting compares
+    ints instead of parsing strings, and category and reading direction
+    strings are interned. Any other key goes into the 'extra' dict. The
+    record still reads like the old book dict (book['title'], get, items,
+    update, ...), and a key that was never set is absent just as in a dict,
+    so from_dict(data).to_dict() == data. Timestamps that would not print
+    back identically (other ISO spellings, unparseable text) keep their
+    original string in 'extra'.
+    """
+
+    __slots__ = SLOT_FIELDS + ('added_us', 'last_opened_us', 'extra', 'frozen')
+
+    def __init__(self, fields=()):
+        self.extra = None
+        self.frozen = False
+        for key, value in dict(fields).items():
+            self[key] = value
+
+    @classmethod
+    def from_dict(cls, data):
+        return data if isinstance(data, cls) else cls(data)
+
+    def to_dict(self):
+        """Plain JSON-ready dict with the original keys and timestamp strings"""
+        data = dict(self.items())
+        if 'favorite_pages' in data:
+            data['favorite_pages'] = [dict(favorite) for favorite in data['favorite_pages'] or ()]
+        return data
+
+    def copy(self):
+        book = Book.__new__(Book)
+        for slot in Book.__slots__:
+            try:
+                setattr(book, slot, getattr(self, slot))
+            except AttributeError:
+                pass  # Field not set
+        book.extra = dict(self.extra) if self.extra else None
+        book.frozen = False
+        return book
+
+    def frozen_copy(self):
+        """Read-only copy (favorite pages included) for library snapshots"""
+        book = self.copy()
+        favorites = getattr(book, 'favorite_pages', None)
+        if favorites is not None:
+            book.favorite_pages = tuple(MappingProxyType(dict(favorite)) for favorite in favorites)
+        book.frozen = True
+        return book
+
+    # ---- mapping interface --------------------------------------------------
+
+    def __getitem__(self, key):
+        if key in DATE_FIELDS:
+            if self.extra and key in self.extra:
+                return self.extra[key]  # Original spelling
+            try:
+                us = getattr(self, DATE_FIELDS[key])
+            except AttributeError:
+                raise KeyError(key) from None
+            return None if us is None else us_to_iso(us)
+        if key in SLOT_SET:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        if self.extra and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if self.frozen:
+            raise TypeError("Book snapshot records are read-only")
+        if key in DATE_FIELDS:
+            self.set_timestamp(key, value)
+        elif key in SLOT_SET:
+            if key in INTERNED_FIELDS and type(value) is str:
+                value = sys.intern(value)
+            setattr(self, key, value)
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+
+    def set_timestamp(self, key, value):
+        raw = None
+        if value is None:
+            us = None
+        else:
+            try:
+                us = iso_to_us(value)
+                if us_to_iso(us) != value:
+                    raw = value
+            except (TypeError, ValueError):
+                us = None
+                raw = value
+        setattr(self, DATE_FIELDS[key], us)
+        if raw is not None:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = raw
+        elif self.extra and key in self.extra:
+            del self.extra[key]
+
+    def __contains__(self, key):
+        if key in DATE_FIELDS:
+            return hasattr(self, DATE_FIELDS[key])
+        if key in SLOT_SET:
+            return hasattr(self, key)
+        return bool(self.extra) and key in self.extra
+
+    def keys(self):
+        keys = [key for key in KEY_ORDER if key in self]
+        if self.extra:
+            keys.extend(key for key in self.extra if key not in DATE_FIELDS)
+        return keys
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def items(self):
+        return [(key, self[key]) for key in self.keys()]
+
+    def values(self):
+        return [self[key] for key in self.keys()]
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def setdefault(self, key, default=None):
+        if key in self:
+            return self[key]
+        self[key] = default
+        return default
+
+    def update(self, changes=(), **fields):
+        for key, value in dict(changes, **fields).items():
+            self[key] = value
+
+    def __repr__(self):
+        return f"Book({self.to_dict()!r})"
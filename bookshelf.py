@@ -5,11 +5,24 @@ import fitz  # PyMuPDF
 import os
 import json
 import hashlib
-import threading
 from datetime import datetime
 import subprocess
 import sys
 import io
+import threading
+import multiprocessing
+from library_store import LibraryStore, WriteBehindQueue
+from reader_channel import ShelfChannelServer
+from shelf_grid import ShelfGrid
+from library import Library
+from content_index import ContentIndex, ContentIndexer
+from thumbnail_service import ThumbnailScheduler
+from thumbnail_pack import (ThumbnailPack, png_to_ppm, ppm_to_png,
+                            make_cover_preview, cover_preview_image)
+from caching import ByteLRU
+
+THUMBNAIL_CACHE_ENV = 'PDF_BOOKSHELF_THUMBNAIL_CACHE_MB'
+RESIDENT_READER_ENV = 'PDF_BOOKSHELF_RESIDENT_READER'  # 0 starts a reader process per book
 
 class PDFBookshelf:
     def __init__(self, root):
@@ -27,22 +40,60 @@ class PDFBookshelf:
             base_path = os.path.dirname(os.path.abspath(__file__))
         
         self.data_dir = os.path.join(base_path, "data")
-        self.thumbnails_dir = os.path.join(self.data_dir, "thumbnails")
-        self.bookshelf_file = os.path.join(self.data_dir, "bookshelf.json")
-        
-        self.books = []
-        self.book_frames = []
-        self.thumbnail_cache = {}
+        self.thumbnails_dir = os.path.join(self.data_dir, "thumbnails")  # Pre-pack PNG thumbnails (migrated)
+        self.thumbnail_pack = ThumbnailPack(os.path.join(self.data_dir, "thumbnails.pack"))
+        self.bookshelf_file = os.path.join(self.data_dir, "bookshelf.json")  # Portable JSON export
+        self.library_db = os.path.join(self.data_dir, "library.db")
+        self.store = None  # Opened in load_bookshelf_data_async
+        self.writer = None  # Background, coalescing writes to the store
+        self.store_error_shown = False
+        
+        self.library = Library()  # Books indexed by id, path and category
+        # Decoded thumbnails, bounded by memory; tiles on screen are never evicted
+        cache_mb = float(os.environ.get(THUMBNAIL_CACHE_ENV) or 64)
+        self.thumbnail_cache = ByteLRU(
+            int(cache_mb * 1024 * 1024),
+            protect=lambda book_id: book_id in self.shelf_grid.tile_by_book
+        )
+        # Blurred covers rebuilt from each book's inline 'cover_preview', shown
+        # while the real thumbnail is decoded at idle time
+        self.preview_cache = ByteLRU(
+            8 * 1024 * 1024,
+            protect=lambda book_id: book_id in self.shelf_grid.tile_by_book
+        )
+        self.pending_decodes = {}  # Book ids whose real thumbnail should replace the preview
+        self.decode_after_id = None
+        self.debug_after_id = None  # Pending refresh of the F12 debug line
         self.categories = set(['All', 'Uncategorized'])  # Default categories
         self.current_category = 'All'
         self.sort_mode = 'recent'  # 'recent', 'added', 'title', 'custom'
+        self.search_after_id = None  # Pending debounced search
+        self.content_index = None  # Full-text page index, opened after the library loads
+        self.content_indexer = None
+        self.content_hits = []  # (book_id, page, snippet) for the current content search
         self.dragging_book = None
         self.drag_data = {}
         
+        # Push channel for reader position/favorite events (replaces JSON polling)
+        self.open_readers = set()  # Book ids with a connected reader
+        # One resident reader process opens every book (unless turned off)
+        self.resident_reader = os.environ.get(RESIDENT_READER_ENV, '1') != '0'
+        self.reader_host = None  # Popen of the resident reader
+        self.reader_channel = ShelfChannelServer(
+            on_event=lambda message: self.root.after(0, lambda: self.on_reader_event(message)),
+            on_disconnect=lambda book_id: self.root.after(0, lambda: self.on_reader_disconnect(book_id))
+        )
+        
+        # Thumbnails are rendered in worker processes, visible books first
+        self.thumbnail_scheduler = ThumbnailScheduler(self.root, self.on_thumbnails_ready)
+        
         # Setup UI first for immediate visual feedback
         self.setup_ui()
         self.bind_keys()
         
+        # Export portable JSON and close the database on exit
+        self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
+        
         # Show loading message
         self.status_var.set("📚 Loading library...")
         self.book_count_label.configure(text="Loading...")
@@ -186,6 +237,22 @@ class PDFBookshelf:
         )
         search_label.pack(side=tk.LEFT, padx=(10, 0))
         
+        # Search inside books (full-text) toggle
+        self.content_search_var = tk.BooleanVar(value=False)
+        self.content_search_check = tk.Checkbutton(
+            search_frame,
+            text="📄",
+            variable=self.content_search_var,
+            command=self.refresh_bookshelf,
+            font=("Arial", 12),
+            bg='#2e2e2e',
+            fg='white',
+            selectcolor='#404040',
+            activebackground='#2e2e2e',
+            activeforeground='white'
+        )
+        self.content_search_check.pack(side=tk.LEFT, padx=(5, 0))
+        
         # Main scrollable area
         self.create_scrollable_area()
         
@@ -196,6 +263,7 @@ class PDFBookshelf:
         status_frame = tk.Frame(self.root, bg='#404040', height=30)
         status_frame.pack(fill=tk.X, side=tk.BOTTOM)
         status_frame.pack_propagate(False)
+        self.status_frame = status_frame
         
         self.status_label = tk.Label(
             status_frame,
@@ -214,6 +282,67 @@ class PDFBookshelf:
             fg='white'
         )
         self.book_count_label.pack(side=tk.RIGHT, padx=10, pady=5)
+        
+        # Cache statistics, toggled with F12
+        self.debug_var = tk.StringVar()
+        self.debug_label = tk.Label(
+            status_frame,
+            textvariable=self.debug_var,
+            font=("Consolas", 9),
+            bg='#404040',
+            fg='#90CAF9'
+        )
+        
+        self.create_content_hits_panel()
+    
+    def create_content_hits_panel(self):
+        """Page hits list for content search (shown only in that mode)"""
+        self.hits_frame = tk.Frame(self.root, bg='#2e2e2e')
+        
+        self.hits_tree = ttk.Treeview(
+            self.hits_frame,
+            columns=('title', 'page', 'snippet'),
+            show='headings',
+            height=8
+        )
+        self.hits_tree.heading('title', text='Book')
+        self.hits_tree.heading('page', text='Page')
+        self.hits_tree.heading('snippet', text='Text')
+        self.hits_tree.column('title', width=220, stretch=False)
+        self.hits_tree.column('page', width=60, stretch=False, anchor=tk.CENTER)
+        self.hits_tree.column('snippet', width=600)
+        
+        hits_scrollbar = ttk.Scrollbar(self.hits_frame, orient="vertical", command=self.hits_tree.yview)
+        self.hits_tree.configure(yscrollcommand=hits_scrollbar.set)
+        
+        self.hits_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        hits_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        
+        # Double-click a hit to open the book at that page
+        self.hits_tree.bind('<Double-1>', self.on_hit_double_click)
+    
+    def show_content_hits(self):
+        """Fill the hits panel from self.content_hits, or hide it outside content search"""
+        self.hits_tree.delete(*self.hits_tree.get_children())
+        if not (self.content_search_var.get() and self.search_var.get().strip()):
+            self.hits_frame.pack_forget()
+            return
+        
+        for i, (book_id, page, snippet) in enumerate(self.content_hits):
+            book = self.library.get(book_id)
+            if book:
+                self.hits_tree.insert('', tk.END, iid=str(i), values=(book['title'][:40], page + 1, snippet))
+        self.hits_frame.pack(fill=tk.X, side=tk.BOTTOM, padx=20, pady=(0, 10), after=self.status_frame)
+    
+    def on_hit_double_click(self, event):
+        """Open the book of a content-search hit directly at the matching page"""
+        item = self.hits_tree.identify_row(event.y)
+        if not item:
+            return
+        book_id, page, _ = self.content_hits[int(item)]
+        book = self.library.get(book_id)
+        if book:
+            self.open_book(book, start_page=page)
     
     def create_scrollable_area(self):
         # Create canvas and scrollbar for scrolling
@@ -221,94 +350,74 @@ class PDFBookshelf:
         canvas_frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=(0, 20))
         
         self.canvas = tk.Canvas(canvas_frame, bg='#2e2e2e', highlightthickness=0)
-        self.scrollbar = ttk.Scrollbar(canvas_frame, orient="vertical", command=self.canvas.yview)
         
-        self.scrollable_frame = tk.Frame(self.canvas, bg='#2e2e2e')
-        
-        self.scrollable_frame.bind(
-            "<Configure>",
-            lambda e: self.canvas.configure(scrollregion=self.canvas.bbox("all"))
+        # Book tiles are drawn directly on the canvas, only for visible rows
+        self.shelf_grid = ShelfGrid(
+            self.canvas,
+            cols=5,
+            get_thumbnail=self.get_thumbnail_photo,
+            get_status=self.get_book_status,
+            callbacks={
+                'press': self.on_drag_start,
+                'drag': self.on_drag_motion,
+                'release': self.on_drag_end,
+                'double': self.on_double_click,
+                'context': self.show_context_menu,
+                'middle': lambda e, b: self.show_book_settings(b),  # Middle click for settings
+                'viewport': self.on_viewport_change
+            }
         )
         
-        self.canvas.create_window((0, 0), window=self.scrollable_frame, anchor="nw")
+        self.scrollbar = ttk.Scrollbar(canvas_frame, orient="vertical", command=self.shelf_grid.yview)
         self.canvas.configure(yscrollcommand=self.scrollbar.set)
         
         self.canvas.pack(side="left", fill="both", expand=True)
         self.scrollbar.pack(side="right", fill="y")
-        
-        # Bind mouse wheel to canvas
-        self.canvas.bind("<MouseWheel>", self.on_mousewheel)
     
-    def on_mousewheel(self, event):
-        self.canvas.yview_scroll(int(-1*(event.delta/120)), "units")
+    def on_viewport_change(self, visible_ids):
+        """Keep on-screen thumbnails most recently used and generate them first"""
+        for book_id in visible_ids:
+            self.thumbnail_cache.touch(book_id)
+        self.thumbnail_scheduler.prioritize(visible_ids)
     
     def bind_keys(self):
         self.root.bind('<Control-o>', lambda e: self.add_pdf())
         self.root.bind('<Control-f>', lambda e: self.search_entry.focus())
         self.root.bind('<F5>', lambda e: self.refresh_bookshelf())
+        self.root.bind('<F12>', lambda e: self.toggle_debug_status())
         self.root.focus_set()
     
+    def toggle_debug_status(self):
+        """Show or hide the cache statistics line in the status bar"""
+        if self.debug_after_id:
+            self.root.after_cancel(self.debug_after_id)
+            self.debug_after_id = None
+            self.debug_label.pack_forget()
+        else:
+            self.debug_label.pack(side=tk.RIGHT, padx=10, pady=5, before=self.book_count_label)
+            self.update_debug_status()
+    
+    def update_debug_status(self):
+        stats = self.thumbnail_cache.stats()
+        self.debug_var.set(
+            f"🖼️ {stats['entries']} cached • {stats['bytes'] / 1048576:.1f}/{stats['budget'] / 1048576:.0f} MB • "
+            f"hit {stats['hits']} / miss {stats['misses']} ({stats['hit_rate']:.0%}) • "
+            f"evicted {stats['evictions']} • queued {len(self.thumbnail_scheduler.jobs)}"
+        )
+        self.debug_after_id = self.root.after(1000, self.update_debug_status)
+    
     def get_file_hash(self, filepath):
         """Generate unique hash for file"""
         hasher = hashlib.md5()
         hasher.update(filepath.encode())
         return hasher.hexdigest()
     
-    def generate_thumbnail(self, pdf_path, book_id, page_num=None):
-        """Generate thumbnail for specified PDF page"""
-        try:
-            # Ensure thumbnails directory exists
-            os.makedirs(self.thumbnails_dir, exist_ok=True)
-            
-            thumbnail_path = os.path.join(self.thumbnails_dir, f"{book_id}.png")
-            
-            # Skip if thumbnail already exists and is recent
-            if os.path.exists(thumbnail_path):
-                return thumbnail_path
-            
-            # Open PDF and get specified page
-            doc = fitz.open(pdf_path)
-            if len(doc) == 0:
-                doc.close()
-                return None
-            
-            # Get page number from book data if not specified
-            if page_num is None:
-                # Find book data to get thumbnail page
-                book_data = next((book for book in self.books if book['id'] == book_id), None)
-                page_num = book_data.get('thumbnail_page', 0) if book_data else 0
-            
-            # Ensure page number is valid
-            page_num = max(0, min(page_num, len(doc) - 1))
-            page = doc[page_num]
-            
-            # Use lower resolution for faster generation
-            mat = fitz.Matrix(0.3, 0.3)  # Reduced scale for faster processing
-            pix = page.get_pixmap(matrix=mat)
-            
-            # Convert to PIL Image
-            img_data = pix.tobytes("ppm")
-            pil_image = Image.open(io.BytesIO(img_data))
-            
-            # Resize to standard thumbnail size
-            pil_image.thumbnail((150, 200), Image.Resampling.LANCZOS)
-            
-            # Save thumbnail with optimization
-            pil_image.save(thumbnail_path, "PNG", optimize=True)
-            doc.close()
-            
-            return thumbnail_path
-            
-        except Exception as e:
-            print(f"Error generating thumbnail for {book_id}: {e}")
-            # Create a default placeholder image
-            try:
-                placeholder = Image.new('RGB', (150, 200), '#666666')
-                placeholder_path = os.path.join(self.thumbnails_dir, f"{book_id}.png")
-                placeholder.save(placeholder_path, "PNG")
-                return placeholder_path
-            except:
-                return None
+    def request_thumbnail(self, book, visible=False):
+        """Queue thumbnail generation for a book unless its thumbnail already exists"""
+        if book['id'] in self.thumbnail_pack:
+            return
+        self.thumbnail_scheduler.request(book['id'], book['path'], book.get('thumbnail_page', 0),
+                                         visible=visible)
     
     def add_pdf(self):
         """Add new PDF to bookshelf"""
@@ -323,12 +432,13 @@ class PDFBookshelf:
         self.status_var.set("Adding PDFs...")
         self.root.update()
         
+        new_books = []
         for file_path in file_paths:
             if not os.path.exists(file_path):
                 continue
             
             # Check if already exists
-            if any(book['path'] == file_path for book in self.books):
+            if self.library.find_by_path(file_path):
                 continue
             
             # Generate book data
@@ -356,88 +466,117 @@ class PDFBookshelf:
                 'thumbnail_page': 0,
                 'reading_direction': 'left_to_right',  # 'right_to_left' or 'left_to_right'
                 'category': 'Uncategorized',  # Default category
-                'custom_order': len(self.books),  # For custom sorting
+                'custom_order': self.library.next_custom_order(),  # For custom sorting (fractional after moves)
                 'favorite_pages': []  # お気に入りページリスト
             }
             
-            self.books.append(book_data)
+            book_data = self.library.add(book_data)
+            new_books.append(book_data)
+            if self.content_indexer:
+                self.content_indexer.enqueue(book_id, file_path)
             
             # Generate thumbnail in background
-            threading.Thread(
-                target=self.generate_thumbnail_async,
-                args=(file_path, book_id),
-                daemon=True
-            ).start()
+            self.request_thumbnail(book_data)
         
-        self.save_bookshelf_data()
+        if self.store_available():
+            self.store.add_books(new_books)
         self.refresh_bookshelf()
         self.status_var.set(f"Added {len(file_paths)} PDF(s)")
     
-    def generate_thumbnail_async(self, pdf_path, book_id):
-        """Generate thumbnail asynchronously"""
-        thumbnail_path = self.generate_thumbnail(pdf_path, book_id)
-        if thumbnail_path:
-            # Update UI on main thread
-            self.root.after(0, lambda: self.update_book_thumbnail(book_id, thumbnail_path))
+    def on_thumbnails_ready(self, results):
+        """Show a batch of finished thumbnails (called on the Tk thread)"""
+        previews = {}
+        for book_id, (ppm_data, cover_preview) in results:
+            if book_id in self.library:
+                self.thumbnail_pack.put(book_id, ppm_data)
+                if cover_preview:
+                    self.library.update(book_id, cover_preview=cover_preview)
+                    previews[book_id] = {'cover_preview': cover_preview}
+                self.update_book_thumbnail(book_id)
+        if previews and self.store_available():
+            self.writer.update_books(previews)
     
-    def update_book_thumbnail(self, book_id, thumbnail_path):
+    def update_book_thumbnail(self, book_id):
         """Update book thumbnail in UI"""
-        if thumbnail_path and os.path.exists(thumbnail_path):
-            try:
-                image = Image.open(thumbnail_path)
-                photo = ImageTk.PhotoImage(image)
-                self.thumbnail_cache[book_id] = photo
-                
-                # Find and update the corresponding book frame
-                for frame_data in self.book_frames:
-                    if frame_data['book_id'] == book_id:
-                        frame_data['image_label'].configure(image=photo)
-                        break
-            except Exception as e:
-                print(f"Error updating thumbnail: {e}")
+        self.thumbnail_cache.discard(book_id)
+        self.preview_cache.discard(book_id)
+        # Redraw the corresponding tile if it is on screen
+        self.shelf_grid.update_tile(book_id)
     
-    def create_book_frame(self, book, row, col):
-        """Create UI frame for a single book"""
-        book_frame = tk.Frame(self.scrollable_frame, bg='#404040', relief=tk.RAISED, bd=1)
-        book_frame.grid(row=row, column=col, padx=10, pady=10, sticky="nsew")
-        
-        # Configure grid weight
-        self.scrollable_frame.grid_rowconfigure(row, weight=0)
-        self.scrollable_frame.grid_columnconfigure(col, weight=1)
+    def load_thumbnail_photo(self, book):
+        """Build a PhotoImage straight from the packed PPM record, or None"""
+        ppm_data = self.thumbnail_pack.get(book['id'])
+        if ppm_data is None:
+            return None
+        try:
+            photo = tk.PhotoImage(data=ppm_data, format='PPM')
+        except Exception as e:
+            print(f"Error loading thumbnail for {book['id']}: {e}")
+            return None
         
-        # Thumbnail
-        thumbnail_path = os.path.join(self.thumbnails_dir, f"{book['id']}.png")
+        # Thumbnails made before cover previews existed get one on first display
+        if not book.get('cover_preview'):
+            try:
+                self.update_book(book, cover_preview=make_cover_preview(Image.open(io.BytesIO(ppm_data))))
+            except Exception as e:
+                print(f"Error creating cover preview for {book['id']}: {e}")
         
-        if os.path.exists(thumbnail_path) and book['id'] not in self.thumbnail_cache:
+        # Tk keeps photo images as 32-bit pixels
+        self.thumbnail_cache.put(book['id'], photo, photo.width() * photo.height() * 4)
+        return photo
+    
+    def get_preview_photo(self, book):
+        """Blurred cover built from the book record alone (no file I/O), or None"""
+        photo = self.preview_cache.peek(book['id'])
+        if photo is None and book.get('cover_preview'):
             try:
-                image = Image.open(thumbnail_path)
-                photo = ImageTk.PhotoImage(image)
-                self.thumbnail_cache[book['id']] = photo
-            except:
+                photo = ImageTk.PhotoImage(cover_preview_image(book['cover_preview']))
+                self.preview_cache.put(book['id'], photo, photo.width() * photo.height() * 4)
+            except Exception as e:
+                print(f"Error drawing cover preview for {book['id']}: {e}")
                 photo = None
-        else:
-            photo = self.thumbnail_cache.get(book['id'])
-        
-        if not photo:
-            # Create placeholder
-            placeholder = Image.new('RGB', (150, 200), '#666666')
-            photo = ImageTk.PhotoImage(placeholder)
-        
-        image_label = tk.Label(book_frame, image=photo, bg='#404040')
-        image_label.pack(pady=(10, 5))
-        
-        # Title
-        title_label = tk.Label(
-            book_frame,
-            text=book['title'][:30] + "..." if len(book['title']) > 30 else book['title'],
-            font=("Arial", 10, "bold"),
-            bg='#404040',
-            fg='white',
-            wraplength=140
-        )
-        title_label.pack(pady=(0, 5))
-        
-        # Pages info with bookmark and favorites status
+        return photo
+    
+    def get_thumbnail_photo(self, book):
+        """PhotoImage for a book tile, or None to use the shared placeholder"""
+        photo = self.thumbnail_cache.get(book['id'])
+        if photo is not None:
+            return photo
+        
+        if book['id'] not in self.thumbnail_pack:
+            # On screen now, so generate it ahead of everything else
+            self.request_thumbnail(book, visible=True)
+            return self.get_preview_photo(book)
+        
+        preview = self.get_preview_photo(book)
+        if preview is None:
+            return self.load_thumbnail_photo(book)
+        
+        # Paint the inline preview this frame; swap in the real thumbnail when idle
+        self.pending_decodes[book['id']] = None
+        if self.decode_after_id is None:
+            self.decode_after_id = self.root.after(1, self.decode_pending_thumbnails)
+        return preview
+    
+    def decode_pending_thumbnails(self):
+        """Replace previews with real thumbnails, a few per event-loop turn"""
+        self.decode_after_id = None
+        for _ in range(8):
+            if not self.pending_decodes:
+                break
+            book_id = next(iter(self.pending_decodes))
+            del self.pending_decodes[book_id]
+            book = self.library.get(book_id)
+            if book is None or book_id not in self.shelf_grid.tile_by_book:
+                continue  # Removed or scrolled away before we got to it
+            if self.load_thumbnail_photo(book) is not None:
+                self.shelf_grid.update_tile(book_id)
+                self.preview_cache.discard(book_id)
+        if self.pending_decodes:
+            self.decode_after_id = self.root.after(1, self.decode_pending_thumbnails)
+    
+    def get_book_status(self, book):
+        """Build the pages/bookmark/favorites line and its color for a book tile"""
         last_page = book.get('last_page', 0)
         favorite_pages = book.get('favorite_pages', [])
         
@@ -454,39 +593,27 @@ class PDFBookshelf:
             status_parts.append(f"⭐ {len(favorite_pages)}")
             info_color = '#FFB74D'  # Orange for books with favorites
         
-        pages_text = " • ".join(status_parts)
-        
-        info_label = tk.Label(
-            book_frame,
-            text=pages_text,
-            font=("Arial", 9),
-            bg='#404040',
-            fg=info_color
-        )
-        info_label.pack(pady=(0, 10))
-        
-        # Store frame data
-        frame_data = {
-            'frame': book_frame,
-            'book_id': book['id'],
-            'book': book,
-            'image_label': image_label
-        }
-        self.book_frames.append(frame_data)
-        
-        # Bind events
-        widgets = [book_frame, image_label, title_label, info_label]
-        for widget in widgets:
-            widget.bind("<Double-Button-1>", lambda e, b=book: self.on_double_click(e, b))
-            widget.bind("<Button-3>", lambda e, b=book: self.show_context_menu(e, b))
-            widget.bind("<Button-2>", lambda e, b=book: self.show_book_settings(b))  # Middle click for settings
-            widget.bind("<Enter>", lambda e, f=book_frame: f.configure(bg='#505050'))
-            widget.bind("<Leave>", lambda e, f=book_frame: f.configure(bg='#404040'))
-            
-            # Drag and drop events
-            widget.bind("<Button-1>", lambda e, b=book, f=book_frame: self.on_drag_start(e, b, f))
-            widget.bind("<B1-Motion>", lambda e, b=book, f=book_frame: self.on_drag_motion(e, b, f))
-            widget.bind("<ButtonRelease-1>", lambda e, b=book, f=book_frame: self.on_drag_end(e, b, f))
+        return " • ".join(status_parts), info_color
+    
+    def update_book_tile(self, book_id):
+        """Redraw a single book tile"""
+        self.shelf_grid.update_tile(book_id)
+    
+    def update_book(self, book, **changes):
+        """Change fields of one book in memory (keeping indexes current) and in the database"""
+        self.library.update(book['id'], **changes)
+        if self.store_available():
+            self.writer.update_book(book['id'], **changes)
+    
+    def store_available(self):
+        """True if the library database is open; otherwise changes stay in memory (reported once)"""
+        if self.store is not None and self.writer is not None:
+            return True
+        if not self.store_error_shown:
+            self.store_error_shown = True
+            messagebox.showerror("Error", "The library database could not be opened.\n"
+                                          "Changes made in this session will not be saved.")
+        return False
     
     def on_double_click(self, event, book):
         """Handle double click - distinguish from drag"""
@@ -495,7 +622,7 @@ class PDFBookshelf:
         # Reset drag data
         self.drag_data = {}
     
-    def on_drag_start(self, event, book, frame):
+    def on_drag_start(self, event, book):
         """Handle drag start"""
         if self.sort_mode != 'custom':
             # Show helpful message if not in custom sort mode
@@ -506,16 +633,16 @@ class PDFBookshelf:
         self.drag_data = {
             'start_x': event.x_root,
             'start_y': event.y_root,
-            'moved': False,
-            'frame': frame,
-            'original_bg': frame.cget('bg')
+            'moved': False
         }
     
-    def on_drag_motion(self, event, book, frame):
+    def on_drag_motion(self, event, target_book):
         """Handle drag motion"""
         if self.sort_mode != 'custom' or not self.dragging_book:
             return
         
+        book = self.dragging_book
+        
         # Check if we've moved enough to consider it a drag
         if not self.drag_data['moved']:
             dx = abs(event.x_root - self.drag_data['start_x'])
@@ -523,47 +650,32 @@ class PDFBookshelf:
             if dx > 5 or dy > 5:  # Threshold for drag detection
                 self.drag_data['moved'] = True
                 # Change appearance to indicate dragging
-                frame.configure(bg='#FFB74D', relief=tk.RAISED, bd=3)  # Orange highlight for dragging book
+                self.shelf_grid.set_highlight(book['id'], '#FFB74D', 3)  # Orange highlight for dragging book
                 self.root.configure(cursor='hand2')
                 # Update status
                 self.status_var.set("📦 ドラッグ中... 他の本の上でドロップしてください")
         
         if self.drag_data['moved']:
-            # Visual feedback - find target position
-            target_frame = self.get_drop_target(event.x_root, event.y_root)
-            if target_frame and target_frame != frame:
-                # Highlight potential drop target
-                for frame_data in self.book_frames:
-                    if frame_data['frame'] == target_frame:
-                        target_frame.configure(bg='#81C784', relief=tk.RAISED, bd=2)  # Green highlight for drop target
-                    elif frame_data['frame'] != frame:
-                        frame_data['frame'].configure(bg='#404040', relief=tk.RAISED, bd=1)  # Reset other frames
-            else:
-                # Reset all other frames if no valid target
-                for frame_data in self.book_frames:
-                    if frame_data['frame'] != frame:
-                        frame_data['frame'].configure(bg='#404040', relief=tk.RAISED, bd=1)
+            # Visual feedback - highlight potential drop target, reset the others
+            self.shelf_grid.clear_highlights(keep=book['id'])
+            if target_book and target_book is not book:
+                self.shelf_grid.set_highlight(target_book['id'], '#81C784', 2)  # Green highlight for drop target
     
-    def on_drag_end(self, event, book, frame):
+    def on_drag_end(self, event, target_book):
         """Handle drag end"""
         if self.sort_mode != 'custom' or not self.dragging_book:
             return
         
+        book = self.dragging_book
+        
         # Reset cursor
         self.root.configure(cursor='')
         
+        # Reset all tile colors and borders
+        self.shelf_grid.clear_highlights()
+        
         if self.drag_data.get('moved', False):
-            # Find drop target
-            target_frame = self.get_drop_target(event.x_root, event.y_root)
-            target_book = None
-            
-            for frame_data in self.book_frames:
-                if frame_data['frame'] == target_frame:
-                    target_book = frame_data['book']
-                    break
-            
-            if target_book and target_book != book:
-                self.reorder_books(book, target_book)
+            if target_book and target_book != book and self.reorder_books(book, target_book):
                 self.status_var.set(f"✅ 「{book['title'][:20]}」を移動しました")
             else:
                 self.status_var.set("❌ 無効な位置です - 他の本の上でドロップしてください")
@@ -571,32 +683,12 @@ class PDFBookshelf:
             # Was not a drag, restore normal status
             self.status_var.set("✋ カスタムソートモード - 本をドラッグして並び替えできます")
         
-        # Reset all frame colors and borders
-        for frame_data in self.book_frames:
-            frame_data['frame'].configure(bg='#404040', relief=tk.RAISED, bd=1)
-        
         # Reset drag state
         self.dragging_book = None
         self.drag_data = {}
     
-    def get_drop_target(self, x, y):
-        """Find the frame under the cursor"""
-        for frame_data in self.book_frames:
-            frame = frame_data['frame']
-            try:
-                fx = frame.winfo_rootx()
-                fy = frame.winfo_rooty()
-                fw = frame.winfo_width()
-                fh = frame.winfo_height()
-                
-                if fx <= x <= fx + fw and fy <= y <= fy + fh:
-                    return frame
-            except:
-                continue
-        return None
-    
     def reorder_books(self, dragged_book, target_book):
-        """Reorder books in custom sort mode"""
+        """Reorder books in custom sort mode (only the dragged book gets a new key); returns success"""
         # Find current positions
         dragged_idx = None
         target_idx = None
@@ -611,27 +703,29 @@ class PDFBookshelf:
                 target_idx = i
         
         if dragged_idx is not None and target_idx is not None:
-            # Reorder custom_order values
+            # The dragged book takes the target's place: just after it when
+            # moving forward, just before it when moving backward
+            others = current_books[:dragged_idx] + current_books[dragged_idx + 1:]
+            target_pos = target_idx - 1 if dragged_idx < target_idx else target_idx
             if dragged_idx < target_idx:
-                # Moving forward
-                for i, book in enumerate(current_books):
-                    if dragged_idx < i <= target_idx:
-                        book['custom_order'] = i - 1
-                    elif i == dragged_idx:
-                        book['custom_order'] = target_idx
+                before = others[target_pos]
+                after = others[target_pos + 1] if target_pos + 1 < len(others) else None
             else:
-                # Moving backward
-                for i, book in enumerate(current_books):
-                    if target_idx <= i < dragged_idx:
-                        book['custom_order'] = i + 1
-                    elif i == dragged_idx:
-                        book['custom_order'] = target_idx
-            
-            self.save_bookshelf_data()
-            self.refresh_bookshelf()
+                before = others[target_pos - 1] if target_pos > 0 else None
+                after = others[target_pos]
+            
+            moved, changed = self.library.move_in_custom_order(dragged_book['id'],
+                                                               before['id'] if before else None,
+                                                               after['id'] if after else None)
+            if changed:
+                if self.store_available():
+                    self.writer.update_books(changed)
+                self.refresh_bookshelf()
+            return moved
+        return False
     
-    def open_book(self, book):
-        """Open PDF in fullscreen reader"""
+    def open_book(self, book, start_page=None):
+        """Open PDF in fullscreen reader (at the bookmark unless start_page is given)"""
         if not os.path.exists(book['path']):
             messagebox.showerror("Error", f"File not found: {book['path']}")
             return
@@ -643,50 +737,42 @@ class PDFBookshelf:
         # Launch fullscreen reader with reading direction and bookmark
         try:
             reading_direction = book.get('reading_direction', 'left_to_right')
-            start_page = book.get('last_page', 0)
-            
-            # Determine base path for finding reader
-            if getattr(sys, 'frozen', False):
-                # Running as .exe
-                base_path = os.path.dirname(sys.executable)
-            else:
-                # Running as Python script
-                base_path = os.path.dirname(os.path.abspath(__file__))
+            jump = start_page is not None  # A reader that already has the book open moves there
+            if start_page is None:
+                start_page = book.get('last_page', 0)
             
-            # Try to launch reader with fallback mechanism
+            # Hand the book to the resident reader if it is running (no process startup)
             reader_launched = False
-            
-            # Priority 1: Try PDF_Reader.exe first
-            reader_exe = os.path.join(base_path, "fullscreen_reader.exe")
-            if os.path.exists(reader_exe):
-                try:
-                    subprocess.Popen([
-                        reader_exe,
-                        book['path'], 
-                        reading_direction, 
-                        str(start_page)
-                    ])
+            if self.resident_reader:
+                command = {'type': 'open', 'path': book['path'],
+                           'reading_direction': reading_direction, 'start_page': start_page,
+                           'jump': jump}
+                if self.reader_channel.send_command(command):
                     reader_launched = True
-                    self.status_var.set(f"📖 Opening {book['title'][:30]} (exe)...")
-                except Exception as exe_error:
-                    print(f"Failed to launch .exe: {exe_error}")
+                elif self.reader_host is not None and self.reader_host.poll() is None:
+                    # Still starting up: the command is sent once it connects
+                    reader_launched = self.reader_channel.send_command(command, queue=True)
+            
+            # A reader process already has this book open: don't start a second one
+            # (two readers would overwrite each other's bookmark). Per-process
+            # readers take no commands, so a page jump has to be done there.
+            if not reader_launched and book['id'] in self.open_readers:
+                if jump:
+                    self.status_var.set(f"📖 {book['title'][:30]} is already open - go to page {start_page + 1} in its reader")
+                else:
+                    self.status_var.set(f"📖 {book['title'][:30]} is already open")
+                return
             
-            # Priority 2: Fallback to fullscreen_reader.py if .exe failed or doesn't exist
+            # Otherwise start a reader process (the resident one, if enabled)
             if not reader_launched:
-                fullscreen_py = os.path.join(base_path, "fullscreen_reader.py")
-                if os.path.exists(fullscreen_py):
-                    try:
-                        subprocess.Popen([
-                            sys.executable, 
-                            fullscreen_py, 
-                            book['path'], 
-                            reading_direction, 
-                            str(start_page)
-                        ])
-                        reader_launched = True
-                        self.status_var.set(f"📖 Opening {book['title'][:30]} (py)...")
-                    except Exception as py_error:
-                        print(f"Failed to launch .py: {py_error}")
+                args = [book['path'], reading_direction, str(start_page)]
+                if self.resident_reader:
+                    args.insert(0, '--host')
+                process = self.launch_reader(args, book)
+                if process is not None:
+                    reader_launched = True
+                    if self.resident_reader:
+                        self.reader_host = process
             
             # If both methods failed, show error
             if not reader_launched:
@@ -695,55 +781,88 @@ class PDFBookshelf:
             # Update last opened after successful launch (async)
             self.root.after(100, lambda: self.update_book_opened(book))
             
-            # Monitor for bookmark updates (check every 3 seconds)
-            self.root.after(3000, lambda: self.monitor_bookmark_updates(book))
+            # Bookmark updates arrive as reader events over self.reader_channel
             
         except Exception as e:
             messagebox.showerror("Error", f"Failed to open reader: {e}")
             self.status_var.set("Ready")
     
+    def launch_reader(self, args, book):
+        """Start the reader with the given arguments; returns the Popen, or None"""
+        # Determine base path for finding reader
+        if getattr(sys, 'frozen', False):
+            # Running as .exe
+            base_path = os.path.dirname(sys.executable)
+        else:
+            # Running as Python script
+            base_path = os.path.dirname(os.path.abspath(__file__))
+        
+        # Priority 1: Try PDF_Reader.exe first
+        reader_exe = os.path.join(base_path, "fullscreen_reader.exe")
+        if os.path.exists(reader_exe):
+            try:
+                process = subprocess.Popen([reader_exe] + args, env=self.reader_channel.environment())
+                self.status_var.set(f"📖 Opening {book['title'][:30]} (exe)...")
+                return process
+            except Exception as exe_error:
+                print(f"Failed to launch .exe: {exe_error}")
+        
+        # Priority 2: Fallback to fullscreen_reader.py if .exe failed or doesn't exist
+        fullscreen_py = os.path.join(base_path, "fullscreen_reader.py")
+        if os.path.exists(fullscreen_py):
+            try:
+                process = subprocess.Popen([sys.executable, fullscreen_py] + args,
+                                           env=self.reader_channel.environment())
+                self.status_var.set(f"📖 Opening {book['title'][:30]} (py)...")
+                return process
+            except Exception as py_error:
+                print(f"Failed to launch .py: {py_error}")
+        return None
+    
     def update_book_opened(self, book):
         """Update book's last opened timestamp asynchronously"""
-        book['last_opened'] = datetime.now().isoformat()
-        self.save_bookshelf_data()
+        self.update_book(book, last_opened=datetime.now().isoformat())
         self.status_var.set(f"✅ {book['title'][:30]} opened successfully")
         # Return to normal status after 2 seconds
         self.root.after(2000, lambda: self.status_var.set("Ready"))
     
-    def monitor_bookmark_updates(self, book):
-        """Monitor for bookmark updates while reader is open"""
-        try:
-            # Reload bookshelf data to get latest bookmarks
-            if os.path.exists(self.bookshelf_file):
-                with open(self.bookshelf_file, 'r', encoding='utf-8') as f:
-                    updated_books = json.load(f)
-                
-                # Find the book and update its data
-                for updated_book in updated_books:
-                    if updated_book['id'] == book['id']:
-                        # Check if bookmark changed
-                        old_bookmark = book.get('last_page', 0)
-                        new_bookmark = updated_book.get('last_page', 0)
-                        
-                        if old_bookmark != new_bookmark:
-                            try:
-                                print(f"DEBUG: Bookmark updated for book ID {book['id']} - from page {old_bookmark} to page {new_bookmark}")
-                            except UnicodeEncodeError:
-                                print(f"DEBUG: Bookmark updated - from page {old_bookmark} to page {new_bookmark}")
-                            # Update local book data
-                            book.update(updated_book)
-                            # Refresh display to show new bookmark
-                            self.refresh_bookshelf()
-                        
-                        break
-                
-                # Continue monitoring (every 3 seconds)
-                self.root.after(3000, lambda: self.monitor_bookmark_updates(book))
-                
-        except Exception as e:
-            print(f"Error monitoring bookmark updates: {e}")
-            # Continue monitoring even if error occurs
-            self.root.after(3000, lambda: self.monitor_bookmark_updates(book))
+    def on_reader_event(self, message):
+        """Apply a position/favorites event published by a reader to its book"""
+        book_id = message.get('book_id')
+        book = self.library.get(book_id)
+        if book is None:
+            return
+        
+        event_type = message.get('type')
+        if event_type == 'hello':
+            self.open_readers.add(book_id)
+            return
+        if event_type == 'position':
+            old_bookmark = book.get('last_page', 0)
+            last_page = message.get('last_page', old_bookmark)
+            last_opened = message.get('last_opened', book.get('last_opened'))
+            self.library.update(book_id, last_page=last_page, last_opened=last_opened)
+            # The reader publishes before its own write-behind flush; queue the
+            # same (idempotent) write so a reader crash cannot lose the position
+            if self.store_available():
+                self.writer.update_bookmark(book['path'], last_page, last_opened)
+            if old_bookmark == book['last_page']:
+                return
+            try:
+                print(f"DEBUG: Bookmark updated for book ID {book_id} - from page {old_bookmark} to page {book['last_page']}")
+            except UnicodeEncodeError:
+                print(f"DEBUG: Bookmark updated - from page {old_bookmark} to page {book['last_page']}")
+        elif event_type == 'favorites':
+            self.library.update(book_id, favorite_pages=message.get('favorite_pages', []))
+        else:
+            return
+        
+        # Redraw only the affected tile
+        self.update_book_tile(book_id)
+    
+    def on_reader_disconnect(self, book_id):
+        """Tear down a book's subscription when its reader closes or crashes"""
+        self.open_readers.discard(book_id)
     
     def show_context_menu(self, event, book):
         """Show context menu for book"""
@@ -823,7 +942,7 @@ class PDFBookshelf:
         # Reset bookmark button
         def reset_bookmark():
             if messagebox.askyesno("Reset Bookmark", "Are you sure you want to reset the bookmark? This will make the book start from page 1 next time."):
-                book['last_page'] = 0
+                self.update_book(book, last_page=0)
                 bookmark_status_label.config(text="No bookmark set", fg='#cccccc')
                 messagebox.showinfo("Bookmark Reset", "Bookmark has been reset successfully!")
         
@@ -932,28 +1051,26 @@ class PDFBookshelf:
         
         def save_settings():
             """Save book settings"""
-            book['title'] = title_var.get().strip() or book['filename']
-            book['reading_direction'] = direction_var.get()
-            book['category'] = category_var.get()
             old_thumb_page = book.get('thumbnail_page', 0)
             new_thumb_page = page_var.get() - 1  # Convert to 0-based
-            book['thumbnail_page'] = new_thumb_page
+            self.update_book(
+                book,
+                title=title_var.get().strip() or book['filename'],
+                reading_direction=direction_var.get(),
+                category=category_var.get(),
+                thumbnail_page=new_thumb_page,
+                last_page=book.get('last_page', 0)
+            )
             
             # Regenerate thumbnail if page changed
             if old_thumb_page != new_thumb_page:
                 # Remove old thumbnail
-                old_thumbnail = os.path.join(self.thumbnails_dir, f"{book['id']}.png")
-                if os.path.exists(old_thumbnail):
-                    os.remove(old_thumbnail)
+                self.thumbnail_scheduler.cancel(book['id'])
+                self.thumbnail_pack.remove(book['id'])
                 
                 # Generate new thumbnail
-                threading.Thread(
-                    target=self.generate_thumbnail_async,
-                    args=(book['path'], book['id']),
-                    daemon=True
-                ).start()
+                self.request_thumbnail(book, visible=True)
             
-            self.save_bookshelf_data()
             self.refresh_bookshelf()
             settings_window.destroy()
             messagebox.showinfo("Settings", "Book settings saved successfully!")
@@ -1007,18 +1124,29 @@ Last Opened: {book['last_opened'][:19].replace('T', ' ') if book['last_opened']
     def remove_book(self, book):
         """Remove book from bookshelf"""
         if messagebox.askyesno("Confirm", f"Remove '{book['title']}' from bookshelf?"):
-            self.books = [b for b in self.books if b['id'] != book['id']]
-            
-            # Remove thumbnail
-            thumbnail_path = os.path.join(self.thumbnails_dir, f"{book['id']}.png")
-            if os.path.exists(thumbnail_path):
-                os.remove(thumbnail_path)
-            
-            self.save_bookshelf_data()
+            self.library.remove(book['id'])
+            self.thumbnail_scheduler.cancel(book['id'])
+            self.thumbnail_cache.discard(book['id'])
+            self.preview_cache.discard(book['id'])
+            if self.content_indexer:
+                self.content_indexer.remove(book['id'])
+            
+            # Remove thumbnail (space is reclaimed by the next compaction)
+            self.thumbnail_pack.remove(book['id'])
+            
+            if self.store_available():
+                self.writer.discard(book['id'])
+                self.store.remove_book(book['id'])
             self.refresh_bookshelf()
     
     def on_search_change(self, *args):
-        """Handle search input changes"""
+        """Handle search input changes (debounced so a burst of keystrokes runs one query)"""
+        if self.search_after_id:
+            self.root.after_cancel(self.search_after_id)
+        self.search_after_id = self.root.after(150, self.run_search)
+    
+    def run_search(self):
+        self.search_after_id = None
         self.refresh_bookshelf()
     
     def on_category_change(self, event=None):
@@ -1093,6 +1221,8 @@ Last Opened: {book['last_opened'][:19].replace('T', ' ') if book['last_opened']
             new_cat = new_cat_var.get().strip()
             if new_cat and new_cat not in self.categories:
                 self.categories.add(new_cat)
+                if self.store_available():
+                    self.store.add_category(new_cat)
                 category_listbox.insert(tk.END, new_cat)
                 new_cat_var.set("")
                 self.update_category_dropdown()
@@ -1103,14 +1233,15 @@ Last Opened: {book['last_opened'][:19].replace('T', ' ') if book['last_opened']
                 cat_name = category_listbox.get(selection[0])
                 if cat_name != 'Uncategorized':  # Can't delete default category
                     # Move books from deleted category to Uncategorized
-                    for book in self.books:
-                        if book.get('category') == cat_name:
-                            book['category'] = 'Uncategorized'
+                    for book in self.library.in_category(cat_name):
+                        self.library.update(book['id'], category='Uncategorized')
                     
                     self.categories.discard(cat_name)
+                    if self.store_available():
+                        self.writer.flush()  # Queued edits may still name the category
+                        self.store.delete_category(cat_name)
                     category_listbox.delete(selection[0])
                     self.update_category_dropdown()
-                    self.save_bookshelf_data()
                 else:
                     messagebox.showwarning("Warning", "Cannot delete the 'Uncategorized' category.")
         
@@ -1156,8 +1287,8 @@ Last Opened: {book['last_opened'][:19].replace('T', ' ') if book['last_opened']
         stats_frame = tk.Frame(popup, bg='#404040', relief=tk.RAISED, bd=1)
         stats_frame.pack(fill=tk.X, padx=20, pady=10)
         
-        total_books = len(self.books)
-        total_favorites = sum(len(book.get('favorite_pages', [])) for book in self.books)
+        total_books = len(self.library)
+        total_favorites = sum(len(book.get('favorite_pages', [])) for book in self.library)
         total_categories = len(self.categories) - 1  # Exclude 'All'
         
         stats_text = f"""📊 Current Profile Statistics:
@@ -1211,8 +1342,9 @@ Last Opened: {book['last_opened'][:19].replace('T', ' ') if book['last_opened']
     def get_data_size(self):
         """Get approximate data size"""
         try:
-            if os.path.exists(self.bookshelf_file):
-                size_bytes = os.path.getsize(self.bookshelf_file)
+            db_files = [self.library_db, self.library_db + "-wal", self.thumbnail_pack.pack_path]
+            if os.path.exists(self.library_db):
+                size_bytes = sum(os.path.getsize(f) for f in db_files if os.path.exists(f))
                 if size_bytes < 1024:
                     return f"{size_bytes} B"
                 elif size_bytes < 1024 * 1024:
@@ -1227,7 +1359,6 @@ Last Opened: {book['last_opened'][:19].replace('T', ' ') if book['last_opened']
         """Export complete profile to file"""
         try:
             from tkinter import filedialog
-            import base64
             from datetime import datetime
             
             # Get export file path
@@ -1245,15 +1376,15 @@ Last Opened: {book['last_opened'][:19].replace('T', ' ') if book['last_opened']
                 return
             
             self.status_var.set("📤 Exporting profile...")
-            self.root.update()
             
-            # Prepare export data
+            # Prepare export data from a snapshot; the shelf stays usable while it is written
+            snapshot = self.library.snapshot()
             export_data = {
                 "profile_version": "1.0",
                 "export_date": datetime.now().isoformat(),
                 "app_version": "1.0",
                 "data": {
-                    "books": self.books,
+                    "books": [],
                     "categories": list(self.categories),
                     "thumbnails": {},
                     "settings": {
@@ -1262,44 +1393,63 @@ Last Opened: {book['last_opened'][:19].replace('T', ' ') if book['last_opened']
                     }
                 },
                 "statistics": {
-                    "total_books": len(self.books),
-                    "total_favorites": sum(len(book.get('favorite_pages', [])) for book in self.books),
+                    "total_books": len(snapshot),
+                    "total_favorites": sum(len(book.get('favorite_pages', ())) for book in snapshot),
                     "export_timestamp": datetime.now().isoformat()
                 }
             }
             
-            # Include thumbnails as base64
-            for book in self.books:
-                thumbnail_path = os.path.join(self.thumbnails_dir, f"{book['id']}.png")
-                if os.path.exists(thumbnail_path):
-                    try:
-                        with open(thumbnail_path, 'rb') as img_file:
-                            img_data = base64.b64encode(img_file.read()).decode('utf-8')
-                            export_data["data"]["thumbnails"][book['id']] = img_data
-                    except Exception as e:
-                        print(f"Error encoding thumbnail for {book['id']}: {e}")
-            
-            # Save export file
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(export_data, f, indent=2, ensure_ascii=False)
-            
-            # Show success message
-            total_books = export_data["statistics"]["total_books"]
-            total_favorites = export_data["statistics"]["total_favorites"]
-            
-            messagebox.showinfo("Export Complete", 
-                              f"Profile exported successfully!\n\n"
-                              f"📚 {total_books} books\n"
-                              f"⭐ {total_favorites} favorites\n"
-                              f"📁 {len(export_data['data']['thumbnails'])} thumbnails\n\n"
-                              f"Saved to: {os.path.basename(file_path)}")
+            def on_exported(error):
+                if error is not None:
+                    messagebox.showerror("Export Error", f"Failed to export profile:\n\n{str(error)}")
+                    self.status_var.set("❌ Export failed")
+                    return
+                
+                # Show success message
+                total_books = export_data["statistics"]["total_books"]
+                total_favorites = export_data["statistics"]["total_favorites"]
+                
+                messagebox.showinfo("Export Complete", 
+                                  f"Profile exported successfully!\n\n"
+                                  f"📚 {total_books} books\n"
+                                  f"⭐ {total_favorites} favorites\n"
+                                  f"📁 {len(export_data['data']['thumbnails'])} thumbnails\n\n"
+                                  f"Saved to: {os.path.basename(file_path)}")
+                
+                self.status_var.set(f"✅ Profile exported to {os.path.basename(file_path)}")
             
-            self.status_var.set(f"✅ Profile exported to {os.path.basename(file_path)}")
+            self.write_profile_async(file_path, export_data, snapshot, on_exported)
             
         except Exception as e:
             messagebox.showerror("Export Error", f"Failed to export profile:\n\n{str(e)}")
             self.status_var.set("❌ Export failed")
     
+    def write_profile_async(self, file_path, profile, snapshot, on_done):
+        """Fill in books and base64 PNG thumbnails from a library snapshot and write the
+        profile file on a worker thread; on_done(error_or_None) runs on the Tk thread"""
+        import base64
+        
+        def worker():
+            error = None
+            try:
+                profile["data"]["books"] = snapshot.to_dicts()
+                thumbnails = profile["data"]["thumbnails"]
+                for book in snapshot:
+                    ppm_data = self.thumbnail_pack.get(book['id'])
+                    if ppm_data is not None:
+                        try:
+                            thumbnails[book['id']] = base64.b64encode(ppm_to_png(ppm_data)).decode('utf-8')
+                        except Exception as e:
+                            print(f"Error encoding thumbnail for {book['id']}: {e}")
+                
+                with open(file_path, 'w', encoding='utf-8') as f:
+                    json.dump(profile, f, indent=2, ensure_ascii=False)
+            except Exception as e:
+                error = e
+            self.root.after(0, on_done, error)
+        
+        threading.Thread(target=worker, daemon=True).start()
+    
     def import_profile(self):
         """Import profile from file"""
         try:
@@ -1341,7 +1491,10 @@ Last Opened: {book['last_opened'][:19].replace('T', ' ') if book['last_opened']
                 raise Exception("Invalid profile file format")
             
             # Import books data
-            self.books = import_data["data"]["books"]
+            self.library.load(import_data["data"]["books"])
+            if self.content_indexer:
+                for book in self.library:
+                    self.content_indexer.enqueue(book['id'], book['path'])
             
             # Import categories
             self.categories = set(import_data["data"]["categories"])
@@ -1353,20 +1506,21 @@ Last Opened: {book['last_opened'][:19].replace('T', ' ') if book['last_opened']
             
             # Import thumbnails
             thumbnails = import_data["data"].get("thumbnails", {})
-            os.makedirs(self.thumbnails_dir, exist_ok=True)
+            self.thumbnail_cache.clear()
+            self.preview_cache.clear()
             
             imported_thumbnails = 0
             for book_id, img_data in thumbnails.items():
                 try:
-                    thumbnail_path = os.path.join(self.thumbnails_dir, f"{book_id}.png")
-                    with open(thumbnail_path, 'wb') as img_file:
-                        img_file.write(base64.b64decode(img_data))
+                    self.thumbnail_pack.put(book_id, png_to_ppm(base64.b64decode(img_data)))
                     imported_thumbnails += 1
                 except Exception as e:
                     print(f"Error importing thumbnail for {book_id}: {e}")
             
-            # Save imported data
-            self.save_bookshelf_data()
+            # Save imported data (after anything still queued, which it supersedes)
+            if self.store_available():
+                self.writer.flush()
+                self.store.replace_all(list(self.library), self.categories)
             
             # Update UI
             self.update_category_dropdown()
@@ -1374,7 +1528,7 @@ Last Opened: {book['last_opened'][:19].replace('T', ' ') if book['last_opened']
             
             # Show success message
             stats = import_data.get("statistics", {})
-            total_books = stats.get("total_books", len(self.books))
+            total_books = stats.get("total_books", len(self.library))
             total_favorites = stats.get("total_favorites", 0)
             
             messagebox.showinfo("Import Complete",
@@ -1405,18 +1559,16 @@ Last Opened: {book['last_opened'][:19].replace('T', ' ') if book['last_opened']
             backup_path = os.path.join(backups_dir, backup_filename)
             
             self.status_var.set("🔄 Creating backup...")
-            self.root.update()
             
             # Create backup using export functionality
-            import base64
-            
+            snapshot = self.library.snapshot()
             backup_data = {
                 "profile_version": "1.0",
                 "export_date": datetime.now().isoformat(),
                 "app_version": "1.0",
                 "backup_type": "automatic",
                 "data": {
-                    "books": self.books,
+                    "books": [],
                     "categories": list(self.categories),
                     "thumbnails": {},
                     "settings": {
@@ -1426,31 +1578,24 @@ Last Opened: {book['last_opened'][:19].replace('T', ' ') if book['last_opened']
                 }
             }
             
-            # Include thumbnails
-            for book in self.books:
-                thumbnail_path = os.path.join(self.thumbnails_dir, f"{book['id']}.png")
-                if os.path.exists(thumbnail_path):
-                    try:
-                        with open(thumbnail_path, 'rb') as img_file:
-                            img_data = base64.b64encode(img_file.read()).decode('utf-8')
-                            backup_data["data"]["thumbnails"][book['id']] = img_data
-                    except:
-                        pass
-            
-            # Save backup
-            with open(backup_path, 'w', encoding='utf-8') as f:
-                json.dump(backup_data, f, indent=2, ensure_ascii=False)
-            
-            # Clean old backups (keep last 5)
-            self.cleanup_old_backups(backups_dir)
-            
-            messagebox.showinfo("Backup Complete",
-                              f"Backup created successfully!\n\n"
-                              f"📁 {backup_filename}\n"
-                              f"📚 {len(self.books)} books backed up\n"
-                              f"💾 Saved in: backups/")
+            def on_backed_up(error):
+                if error is not None:
+                    messagebox.showerror("Backup Error", f"Failed to create backup:\n\n{str(error)}")
+                    self.status_var.set("❌ Backup failed")
+                    return
+                
+                # Clean old backups (keep last 5)
+                self.cleanup_old_backups(backups_dir)
+                
+                messagebox.showinfo("Backup Complete",
+                                  f"Backup created successfully!\n\n"
+                                  f"📁 {backup_filename}\n"
+                                  f"📚 {len(snapshot)} books backed up\n"
+                                  f"💾 Saved in: backups/")
+                
+                self.status_var.set(f"✅ Backup created: {backup_filename}")
             
-            self.status_var.set(f"✅ Backup created: {backup_filename}")
+            self.write_profile_async(backup_path, backup_data, snapshot, on_backed_up)
             
         except Exception as e:
             messagebox.showerror("Backup Error", f"Failed to create backup:\n\n{str(e)}")
@@ -1478,84 +1623,41 @@ Last Opened: {book['last_opened'][:19].replace('T', ' ') if book['last_opened']
         self.category_dropdown.config(values=categories_list)
     
     def get_sorted_books(self):
-        """Get filtered and sorted books (used for drag and drop)"""
-        # Filter books based on search and category
-        search_term = self.search_var.get().lower()
+        """Get filtered and sorted books (shared by the grid and drag and drop)"""
+        search_term = self.search_var.get().strip()
         current_cat = self.current_category
         
-        filtered_books = []
-        for book in self.books:
-            # Category filter
-            book_category = book.get('category', 'Uncategorized')
-            if current_cat != 'All' and book_category != current_cat:
-                continue
-            
-            # Search filter
-            if search_term:
-                if (search_term in book['title'].lower() or 
-                    search_term in book['filename'].lower() or
-                    search_term in book_category.lower()):
-                    filtered_books.append(book)
-            else:
-                filtered_books.append(book)
-        
-        return self.sort_books(filtered_books)
-    
-    def sort_books(self, books):
-        """Sort books based on current sort mode"""
-        if self.sort_mode == 'recent':
-            return sorted(books, key=lambda x: (
-                x['last_opened'] or '1900-01-01T00:00:00',
-                x['added_date']
-            ), reverse=True)
-        elif self.sort_mode == 'added':
-            return sorted(books, key=lambda x: x['added_date'], reverse=True)
-        elif self.sort_mode == 'title':
-            return sorted(books, key=lambda x: x['title'].lower())
-        elif self.sort_mode == 'custom':
-            return sorted(books, key=lambda x: x.get('custom_order', 999))
-        else:
+        if search_term and self.content_search_var.get():
+            # Search inside books: books in order of their best page hit
+            self.content_hits = self.content_index.search(search_term) if self.content_index else []
+            books = []
+            seen = set()
+            for book_id, _, _ in self.content_hits:
+                book = self.library.get(book_id)
+                if book is None or book_id in seen:
+                    continue
+                seen.add(book_id)
+                if current_cat == 'All' or book.get('category', 'Uncategorized') == current_cat:
+                    books.append(book)
             return books
+        
+        self.content_hits = []
+        # Ranked trigram search (custom order when arranging by hand) or the
+        # category's maintained sort order, cached until the library changes
+        category = None if current_cat == 'All' else current_cat
+        return self.library.query(search_term, category, self.sort_mode)
     
     def refresh_bookshelf(self):
         """Refresh the bookshelf display"""
-        # Clear existing frames
-        for frame_data in self.book_frames:
-            frame_data['frame'].destroy()
-        self.book_frames.clear()
+        search_term = self.search_var.get().strip()
+        filtered_books = self.get_sorted_books()
         
-        # Filter books based on search and category
-        search_term = self.search_var.get().lower()
-        current_cat = self.current_category
-        
-        filtered_books = []
-        for book in self.books:
-            # Category filter
-            book_category = book.get('category', 'Uncategorized')
-            if current_cat != 'All' and book_category != current_cat:
-                continue
-            
-            # Search filter
-            if search_term:
-                if (search_term in book['title'].lower() or 
-                    search_term in book['filename'].lower() or
-                    search_term in book_category.lower()):
-                    filtered_books.append(book)
-            else:
-                filtered_books.append(book)
-        
-        # Sort books based on sort mode
-        filtered_books = self.sort_books(filtered_books)
-        
-        # Create grid of books
-        cols = 5  # Number of columns
-        for i, book in enumerate(filtered_books):
-            row = i // cols
-            col = i % cols
-            self.create_book_frame(book, row, col)
+        # Hand the ordered list to the grid; it only draws the visible rows
+        self.shelf_grid.set_books(filtered_books)
+        self.show_content_hits()
         
         # Update status
-        total_books = len(self.books)
+        total_books = len(self.library)
         shown_books = len(filtered_books)
         
         if search_term:
@@ -1564,10 +1666,6 @@ Last Opened: {book['last_opened'][:19].replace('T', ' ') if book['last_opened']
             self.status_var.set("Ready")
         
         self.book_count_label.configure(text=f"{total_books} books")
-        
-        # Update canvas scroll region
-        self.root.update_idletasks()
-        self.canvas.configure(scrollregion=self.canvas.bbox("all"))
     
     def load_bookshelf_data_async(self):
         """Load bookshelf data asynchronously after UI is shown"""
@@ -1575,19 +1673,14 @@ Last Opened: {book['last_opened'][:19].replace('T', ' ') if book['last_opened']
         self.root.update()
         
         # Load data in the background
-        try:
-            if os.path.exists(self.bookshelf_file):
-                with open(self.bookshelf_file, 'r', encoding='utf-8') as f:
-                    self.books = json.load(f)
-        except Exception as e:
-            print(f"Error loading bookshelf data: {e}")
-            self.books = []
+        loaded = self.load_books_from_store()
+        
+        # Update categories from loaded books (Library defaults missing ones to Uncategorized)
+        self.categories.update(self.library.by_category)
         
-        # Update categories from loaded books and ensure defaults
-        for book in self.books:
-            if 'category' not in book:
-                book['category'] = 'Uncategorized'
-            self.categories.add(book['category'])
+        self.status_var.set("🖼️ Preparing thumbnails...")
+        self.root.update()
+        self.maintain_thumbnail_pack(loaded)
         
         # Update UI elements
         self.status_var.set("🎨 Updating interface...")
@@ -1601,45 +1694,93 @@ Last Opened: {book['last_opened'][:19].replace('T', ' ') if book['last_opened']
         
         # Use after() to allow UI updates between operations
         self.root.after(10, self.refresh_bookshelf_complete)
+        
+        # Index page text for content search in the background
+        self.root.after(1000, self.start_content_indexer)
     
     def refresh_bookshelf_complete(self):
         """Complete the bookshelf refresh and show final status"""
         self.refresh_bookshelf()
         
         # Show completion message briefly, then return to normal
-        total_books = len(self.books)
+        total_books = len(self.library)
         self.status_var.set(f"✅ Library loaded - {total_books} books")
         
         # Return to normal status after 2 seconds
         self.root.after(2000, lambda: self.status_var.set("Ready"))
 
-    def load_bookshelf_data(self):
-        """Load bookshelf data from JSON file (synchronous version for compatibility)"""
+    def load_books_from_store(self):
+        """Open the library database (migrating bookshelf.json once) and load books; returns success"""
         try:
-            if os.path.exists(self.bookshelf_file):
-                with open(self.bookshelf_file, 'r', encoding='utf-8') as f:
-                    self.books = json.load(f)
+            if self.store is None:
+                self.store = LibraryStore(self.library_db, self.bookshelf_file)
+                self.writer = WriteBehindQueue(self.store)
+            self.library.load(self.store.load_books())
+            self.categories.update(self.store.load_categories())
+            return True
         except Exception as e:
             print(f"Error loading bookshelf data: {e}")
-            self.books = []
+            self.library.load([])
+            return False
+    
+    def maintain_thumbnail_pack(self, library_loaded=True):
+        """Migrate old PNG thumbnails into the pack and compact away removed books"""
+        try:
+            migrated = self.thumbnail_pack.migrate_png_dir(self.thumbnails_dir)
+            if migrated:
+                print(f"Migrated {migrated} thumbnails into {self.thumbnail_pack.pack_path}")
+            # After a failed load the library is empty, not a list of removed books:
+            # only drop superseded records then
+            keep_ids = self.library.by_id if library_loaded else None
+            if self.thumbnail_pack.needs_compaction(keep_ids):
+                self.thumbnail_pack.compact(keep_ids)
+        except Exception as e:
+            print(f"Error maintaining thumbnail pack: {e}")
+    
+    def load_bookshelf_data(self):
+        """Load bookshelf data from the library database (synchronous version for compatibility)"""
+        loaded = self.load_books_from_store()
         
-        # Update categories from loaded books and ensure defaults
-        for book in self.books:
-            if 'category' not in book:
-                book['category'] = 'Uncategorized'
-            self.categories.add(book['category'])
+        # Update categories from loaded books (Library defaults missing ones to Uncategorized)
+        self.categories.update(self.library.by_category)
+        self.maintain_thumbnail_pack(loaded)
         
         self.update_category_dropdown()
         self.refresh_bookshelf()
     
-    def save_bookshelf_data(self):
-        """Save bookshelf data to JSON file"""
+    def start_content_indexer(self):
+        """Open the full-text index and queue every book (unchanged ones are skipped)"""
+        try:
+            self.content_index = ContentIndex(os.path.join(self.data_dir, "content_index.db"))
+            self.content_indexer = ContentIndexer(self.content_index)
+            for book in self.library.snapshot():
+                self.content_indexer.enqueue(book['id'], book['path'])
+        except Exception as e:
+            print(f"Error starting content indexer: {e}")
+    
+    def export_bookshelf_json(self):
+        """Write the portable bookshelf.json copy of the library database"""
         try:
-            os.makedirs(self.data_dir, exist_ok=True)
-            with open(self.bookshelf_file, 'w', encoding='utf-8') as f:
-                json.dump(self.books, f, indent=2, ensure_ascii=False)
+            if self.store:
+                if self.writer:
+                    self.writer.flush()
+                self.store.export_json(self.bookshelf_file)
         except Exception as e:
-            print(f"Error saving bookshelf data: {e}")
+            print(f"Error exporting bookshelf data: {e}")
+    
+    def on_closing(self):
+        """Export the portable JSON copy and close the database before exiting"""
+        self.reader_channel.close()
+        self.thumbnail_scheduler.shutdown()
+        self.thumbnail_pack.close()
+        if self.content_indexer:
+            self.content_indexer.stop()
+        if self.writer:
+            self.writer.close()
+        self.export_bookshelf_json()
+        if self.store:
+            self.store.close()
+        self.root.destroy()
 
 def main():
     root = tk.Tk()
@@ -1647,4 +1788,5 @@ def main():
     root.mainloop()
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # Thumbnail workers in the packaged .exe
     main()
\ No newline at end of file
@@ -0,0 +1,97 @@
+from collections import OrderedDict
+
+
+class ByteLRU:
+    """Least-recently-used cache bounded by the total size of its values.
+
+    Each entry is stored with its size in bytes; inserting past the budget
+    evicts the least recently used entries first. Entries for which the
+    optional protect(key) returns True (e.g. images currently on screen) are
+    skipped by eviction, so the cache may briefly run over budget rather
+    than drop something still in use. Hit, miss and eviction counts are kept
+    for diagnostics.
+    """
+
+    def __init__(self, budget_bytes, protect=None, on_evict=None):
+        self.budget = budget_bytes
+        self.protect = protect
+        self.on_evict = on_evict
+        self.entries = OrderedDict()  # key -> (value, size), oldest first
+        self.total = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def get(self, key, default=None):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return entry[0]
+
+    def peek(self, key, default=None):
+        """Look up without touching recency or the counters"""
+        entry = self.entries.get(key)
+        return default if entry is None else entry[0]
+
+    def touch(self, key):
+        if key in self.entries:
+            self.entries.move_to_end(key)
+
+    def put(self, key, value, size):
+        self.discard(key)
+        self.entries[key] = (value, size)
+        self.total += size
+        self.evict()
+
+    def discard(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.total -= entry[1]
+        return entry is not None
+
+    def clear(self):
+        self.entries.clear()
+        self.total = 0
+
+    def evict(self):
+        if self.total <= self.budget:
+            return
+        for key in list(self.entries):
+            if self.total <= self.budget:
+                break
+            if self.protect is not None and self.protect(key):
+                continue
+            value, size = self.entries.pop(key)
+            self.total -= size
+            self.evictions += 1
+            if self.on_evict is not None:
+                self.on_evict(key, value)
+
+    def set_budget(self, budget_bytes):
+        self.budget = budget_bytes
+        self.evict()
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self):
+        return {
+            'entries': len(self.entries),
+            'bytes': self.total,
+            'budget': self.budget,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hit_rate,
+        }
@@ -0,0 +1,241 @@
+import sqlite3
+import os
+import queue
+import threading
+import time
+import fitz  # PyMuPDF
+
+
+class ContentIndex:
+    """SQLite FTS5 index of PDF page text, one row per (book_id, page).
+
+    The 'files' table remembers the size/mtime each book was indexed at and
+    how many pages are done, so indexing resumes where it stopped and skips
+    files that have not changed.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.lock = threading.RLock()
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.conn = sqlite3.connect(db_path, timeout=10, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.available = self.create_schema()
+        self.trigram = self.available and self.uses_trigram()
+
+    def create_schema(self):
+        with self.lock, self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS files ("
+                "book_id TEXT PRIMARY KEY, size INTEGER, mtime REAL, "
+                "page_count INTEGER, pages_done INTEGER, complete INTEGER)"
+            )
+            # The trigram tokenizer also matches text without word breaks
+            # (Japanese); fall back to unicode61 on older SQLite builds
+            for tokenizer in ("trigram", "unicode61"):
+                try:
+                    self.conn.execute(
+                        "CREATE VIRTUAL TABLE IF NOT EXISTS pages USING fts5("
+                        f"text, book_id UNINDEXED, page UNINDEXED, tokenize='{tokenizer}')"
+                    )
+                    return True
+                except sqlite3.OperationalError:
+                    continue
+        print("SQLite FTS5 is not available - content search disabled")
+        return False
+
+    def uses_trigram(self):
+        """True if the pages table was created with the trigram tokenizer"""
+        with self.lock:
+            row = self.conn.execute("SELECT sql FROM sqlite_master WHERE name = 'pages'").fetchone()
+        return bool(row) and 'trigram' in row[0]
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def file_state(self, book_id):
+        with self.lock:
+            return self.conn.execute(
+                "SELECT size, mtime, page_count, pages_done, complete FROM files WHERE book_id = ?",
+                (book_id,)
+            ).fetchone()
+
+    def begin_file(self, book_id, size, mtime, page_count):
+        """Start (or restart, if the file changed) indexing a book; returns the first page to do"""
+        state = self.file_state(book_id)
+        if state and state[0] == size and state[1] == mtime:
+            return state[3]
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM pages WHERE book_id = ?", (book_id,))
+            self.conn.execute(
+                "INSERT OR REPLACE INTO files(book_id, size, mtime, page_count, pages_done, complete) "
+                "VALUES (?, ?, ?, ?, 0, 0)",
+                (book_id, size, mtime, page_count)
+            )
+        return 0
+
+    def add_pages(self, book_id, pages, pages_done, complete):
+        """Store a batch of (page, text) rows and the resume point in one transaction"""
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT INTO pages(text, book_id, page) VALUES (?, ?, ?)",
+                [(text, book_id, page) for page, text in pages]
+            )
+            self.conn.execute(
+                "UPDATE files SET pages_done = ?, complete = ? WHERE book_id = ?",
+                (pages_done, int(complete), book_id)
+            )
+
+    def remove_book(self, book_id):
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM pages WHERE book_id = ?", (book_id,))
+            self.conn.execute("DELETE FROM files WHERE book_id = ?", (book_id,))
+
+    def search(self, query, limit=200):
+        """Best-ranked (book_id, page, snippet) hits for a phrase query"""
+        query = query.strip()
+        if not self.available or not query:
+            return []
+        if self.trigram and len(query) < 3:
+            return self.scan(query, limit)  # Trigrams need three characters
+        phrase = '"' + query.replace('"', '""') + '"'
+        try:
+            with self.lock:
+                rows = self.conn.execute(
+                    "SELECT book_id, page, snippet(pages, 0, '[', ']', '…', 32) "
+                    "FROM pages WHERE pages MATCH ? ORDER BY rank LIMIT ?",
+                    (phrase, limit)
+                ).fetchall()
+        except sqlite3.OperationalError as e:
+            print(f"Content search error: {e}")
+            return []
+        return [(book_id, int(page), snippet.replace("\n", " ")) for book_id, page, snippet in rows]
+
+    def scan(self, query, limit=200, context=16):
+        """Substring scan for queries too short for the trigram index (e.g. two-kanji words)"""
+        pattern = '%' + query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        try:
+            with self.lock:
+                rows = self.conn.execute(
+                    "SELECT book_id, page, text FROM pages WHERE text LIKE ? ESCAPE '\\' LIMIT ?",
+                    (pattern, limit)
+                ).fetchall()
+        except sqlite3.OperationalError as e:
+            print(f"Content search error: {e}")
+            return []
+        hits = []
+        for book_id, page, text in rows:
+            at = max(0, text.lower().find(query.lower()))
+            end = at + len(query)
+            snippet = (('…' if at > context else '') + text[max(0, at - context):at]
+                       + '[' + text[at:end] + ']' + text[end:end + context]
+                       + ('…' if end + context < len(text) else ''))
+            hits.append((book_id, int(page), snippet.replace("\n", " ")))
+        return hits
+
+
+class ContentIndexer:
+    """Low-priority background worker that extracts page text into a ContentIndex.
+
+    A single daemon thread works through a bounded queue of books, yields
+    between pages and commits in small batches, so it never competes with
+    the UI for long.
+    """
+
+    BATCH_PAGES = 16
+    PAGE_PAUSE = 0.005  # Seconds to yield between pages
+
+    def __init__(self, index, max_pending=100000):
+        self.index = index
+        self.pending = queue.Queue(maxsize=max_pending)
+        self.queued = set()
+        self.cancelled = set()
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def enqueue(self, book_id, path):
+        if not self.index.available or book_id in self.queued:
+            return
+        try:
+            self.pending.put_nowait((book_id, path))
+            self.queued.add(book_id)
+            self.cancelled.discard(book_id)
+        except queue.Full:
+            pass  # Picked up again on the next start
+
+    def remove(self, book_id):
+        """Stop indexing a book and delete its rows (a batch in progress is not written afterwards)"""
+        with self.index.lock:
+            self.cancelled.add(book_id)
+            self.index.remove_book(book_id)
+
+    def write_batch(self, book_id, pages, pages_done, complete):
+        """add_pages unless remove() got there first; returns False if the book was removed"""
+        with self.index.lock:
+            if book_id in self.cancelled:
+                return False
+            self.index.add_pages(book_id, pages, pages_done, complete)
+            return True
+
+    def stop(self):
+        self.running = False
+        self.pending.put((None, None))
+
+    def run(self):
+        try:
+            # Lower this thread's scheduling priority where the OS allows it
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 10)
+        except (AttributeError, OSError):
+            pass
+
+        while self.running:
+            book_id, path = self.pending.get()
+            if book_id is None:
+                break
+            self.queued.discard(book_id)
+            if book_id in self.cancelled:
+                continue
+            try:
+                self.index_book(book_id, path)
+            except Exception as e:
+                print(f"Error indexing text of {os.path.basename(path)}: {e}")
+
+    def index_book(self, book_id, path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return  # Missing file; indexed when it comes back
+        state = self.index.file_state(book_id)
+        if state and state[4] and state[0] == stat.st_size and state[1] == stat.st_mtime:
+            return  # Unchanged and already complete
+
+        doc = fitz.open(path)
+        try:
+            page_count = len(doc)
+            with self.index.lock:
+                if book_id in self.cancelled:
+                    return
+                start = self.index.begin_file(book_id, stat.st_size, stat.st_mtime, page_count)
+            batch = []
+            for page_num in range(start, page_count):
+                if not self.running or book_id in self.cancelled:
+                    break
+                text = doc[page_num].get_text().strip()
+                if text:
+                    batch.append((page_num, text))
+                done = page_num + 1
+                # Every BATCH_PAGES pages processed, text or not, so scanned
+                # books without a text layer still advance the resume point
+                if (done - start) % self.BATCH_PAGES == 0 or done == page_count:
+                    if not self.write_batch(book_id, batch, done, done == page_count):
+                        break
+                    batch = []
+                time.sleep(self.PAGE_PAUSE)
+            else:
+                if start >= page_count:
+                    self.write_batch(book_id, [], page_count, True)
+        finally:
+            doc.close()
@@ -0,0 +1,144 @@
+import os
+import zlib
+import queue
+import hashlib
+import threading
+from caching import ByteLRU
+
+
+class DiskPageCache:
+    """Rendered reader pages kept on disk between sessions.
+
+    Each entry is one zlib-compressed PPM file named after the book
+    fingerprint, page and render size, so a reopened book finds its pages
+    without rasterizing them again and the bytes go straight to Tk's
+    PhotoImage. Files are written to a temporary name and renamed, so
+    several readers can share the directory. The total size is capped;
+    the least recently used files (by mtime, which a hit refreshes) are
+    deleted first. Compressing and writing, and loads requested with
+    load(), happen on a background thread.
+    """
+
+    SUFFIX = '.ppz'
+    COMPRESS_LEVEL = 1  # Decoding speed matters more than size
+    FINGERPRINT_BYTES = 64 * 1024
+
+    def __init__(self, cache_dir, budget_bytes):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+        self.lock = threading.Lock()
+        self.index = ByteLRU(budget_bytes, on_evict=self.delete_file)  # name -> (None, size)
+        self.tasks = queue.Queue()
+        self.scan()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    @classmethod
+    def fingerprint(cls, pdf_path):
+        """Identity of a PDF's contents (size plus its first and last bytes), stable across moves"""
+        digest = hashlib.sha1()
+        size = os.path.getsize(pdf_path)
+        digest.update(str(size).encode('ascii'))
+        with open(pdf_path, 'rb') as f:
+            digest.update(f.read(cls.FINGERPRINT_BYTES))
+            if size > cls.FINGERPRINT_BYTES:
+                f.seek(max(cls.FINGERPRINT_BYTES, size - cls.FINGERPRINT_BYTES))
+                digest.update(f.read())
+        return digest.hexdigest()[:20]
+
+    @classmethod
+    def entry_name(cls, fingerprint, page_num, width, height, zoom):
+        return f"{fingerprint}-{page_num}-{width}x{height}-{round(zoom * 1000)}{cls.SUFFIX}"
+
+    def scan(self):
+        """Index the files left by earlier sessions, oldest first"""
+        files = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            try:
+                if name.endswith('.tmp'):
+                    os.remove(path)  # Interrupted write
+                elif name.endswith(self.SUFFIX):
+                    stat = os.stat(path)
+                    files.append((stat.st_mtime, name, stat.st_size))
+            except OSError:
+                pass
+        with self.lock:
+            for _, name, size in sorted(files):
+                self.index.put(name, None, size)
+
+    def __contains__(self, name):
+        with self.lock:
+            return name in self.index
+
+    def get(self, name):
+        """PPM bytes of a cached page, or None"""
+        with self.lock:
+            if self.index.get(name, False) is False:
+                return None
+        path = os.path.join(self.cache_dir, name)
+        try:
+            with open(path, 'rb') as f:
+                ppm_data = zlib.decompress(f.read())
+            os.utime(path)  # Recency for the next session's scan
+            return ppm_data
+        except (OSError, zlib.error) as e:
+            # Evicted by another reader, or a damaged file
+            if not isinstance(e, FileNotFoundError):
+                print(f"Error reading cached page {name}: {e}")
+            with self.lock:
+                self.index.discard(name)
+            self.delete_file(name)
+            return None
+
+    def load(self, name, callback):
+        """Read a page on the background thread; callback(ppm_bytes_or_None) runs there too"""
+        self.tasks.put(('load', name, callback))
+
+    def put(self, name, ppm_data):
+        """Store a page in the background"""
+        self.tasks.put(('store', name, ppm_data))
+
+    def store(self, name, ppm_data):
+        record = zlib.compress(ppm_data, self.COMPRESS_LEVEL)
+        path = os.path.join(self.cache_dir, name)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(temp_path, 'wb') as f:
+                f.write(record)
+            os.replace(temp_path, path)
+        except OSError as e:
+            print(f"Error caching page {name}: {e}")
+            self.delete_file(temp_path)
+            return
+        with self.lock:
+            self.index.put(name, None, len(record))
+
+    def delete_file(self, name, value=None):
+        try:
+            os.remove(os.path.join(self.cache_dir, name))
+        except OSError:
+            pass
+
+    def run(self):
+        while True:
+            task = self.tasks.get()
+            if task is None:
+                break
+            action, name, argument = task
+            try:
+                if action == 'load':
+                    argument(self.get(name))
+                else:
+                    self.store(name, argument)
+            except Exception as e:
+                print(f"Page cache {action} failed for {name}: {e}")
+
+    def close(self, timeout=2.0):
+        """Finish queued writes (up to timeout seconds) and stop the thread"""
+        self.tasks.put(None)
+        self.thread.join(timeout)
+
+    def stats(self):
+        with self.lock:
+            return self.index.stats()
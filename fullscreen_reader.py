@@ -1,15 +1,66 @@
 import tkinter as tk
 from tkinter import filedialog, messagebox
-from PIL import Image, ImageTk
 import fitz  # PyMuPDF
 import os
 import sys
+import math
+import time
 import threading
-import io as tk_io
+import multiprocessing
+from library_store import LibraryStore, WriteBehindQueue
+from reader_channel import ReaderChannelClient
+from page_cache import PageCache
+from disk_page_cache import DiskPageCache
+from render_service import RenderService, RenderPool
+from prefetch import Prefetcher
+
+PAGE_CACHE_ENV = 'PDF_READER_PAGE_CACHE_MB'
+RSS_LIMIT_ENV = 'PDF_READER_RSS_LIMIT_MB'
+RENDER_PROCESSES_ENV = 'PDF_READER_RENDER_PROCESSES'  # >1 renders pages in a process pool
+DISK_CACHE_ENV = 'PDF_READER_DISK_CACHE_MB'  # 0 turns off the on-disk page cache
+PREVIEW_FACTOR = 4  # Quick previews render at 1/4 size and are shown zoomed up
+TILE_SIZE = 512  # Pages zoomed in past 100% are rendered as square tiles of this many pixels
+NAV_FRAME_MS = 40  # Page turns redraw at most once per frame; held keys skip the spreads between
+BOOKMARK_DELAY_MS = 1000  # The position is saved once page turning has stopped this long
+
+def app_base_path():
+    """Folder holding the data directory: next to the .exe, or next to this script"""
+    if getattr(sys, 'frozen', False):
+        return os.path.dirname(sys.executable)
+    return os.path.dirname(os.path.abspath(__file__))
+
+def create_page_cache(protect):
+    """Rendered pages, bounded by memory and biased toward the reading position"""
+    cache_mb = float(os.environ.get(PAGE_CACHE_ENV) or 512)
+    rss_limit_mb = float(os.environ.get(RSS_LIMIT_ENV) or 2048)
+    return PageCache(int(cache_mb * 1024 * 1024), rss_limit=int(rss_limit_mb * 1024 * 1024), protect=protect)
+
+def create_disk_cache(base_path):
+    """Rendered pages kept between sessions, or None if turned off"""
+    disk_cache_mb = float(os.environ.get(DISK_CACHE_ENV) or 256)
+    if disk_cache_mb <= 0:
+        return None
+    try:
+        return DiskPageCache(os.path.join(base_path, "data", "page_cache"), int(disk_cache_mb * 1024 * 1024))
+    except OSError as e:
+        print(f"Disk page cache unavailable: {e}")
+        return None
+
+def create_render_pool(root):
+    """Shared render process pool if configured (multi-core machines), otherwise None"""
+    processes = int(os.environ.get(RENDER_PROCESSES_ENV) or 0)
+    if processes > 1:
+        try:
+            return RenderPool(root, processes)
+        except Exception as e:
+            print(f"Render pool unavailable, using a render thread: {e}")
+    return None
 
 class FullscreenReader:
-    def __init__(self, root, pdf_path=None, reading_direction='left_to_right', start_page=0):
+    def __init__(self, root, pdf_path=None, reading_direction='left_to_right', start_page=0, host=None):
         self.root = root
+        self.host = host  # ReaderHost when running as a window of the resident reader
+        self.closed = False
         self.root.title("PDF Reader")
         self.root.configure(bg='#1a1a1a')
         
@@ -21,22 +72,44 @@ class FullscreenReader:
         self.start_pdf_page = start_page
         self.current_page = 0  # Will be set correctly after PDF loads
         self.total_pages = 0
-        self.page_images = {}
+        self.doc_token = None  # Identifies the open document in page cache keys
+        self.displayed_pages = set()  # Pages on screen, never evicted
+        self.nav_direction = 1  # +1 after moving forward, -1 after moving back
+        self.render_service = None  # Background renderer with its own document handle
+        self.canvas_keys = {}  # Canvas -> page cache key it is showing (or waiting for)
+        self.prefetcher = Prefetcher()  # Sizes the preload window from render time and turn pace
+        self.visible_tiles = set()  # Tile keys on screen while zoomed in, never evicted
+        self.page_sizes = {}  # Page -> (width, height) in PDF points, for laying out tiles
+        self.pan_x = 0.5  # Centre of the zoomed-in view, as fractions of the page
+        self.pan_y = 0.5
+        self.pan_direction = (0, 0)  # Which way the view last moved, to prefetch tiles ahead of it
+        self.drag = None  # Press position while the mouse button is down on a page
+        # Rendered pages; a resident reader shares one cache between its windows
+        self.page_cache = host.page_cache if host else create_page_cache(self.protects)
         self.display_scale = 1.0
+        self.device_scale = 1.0  # Screen DPI / 96; part of page cache keys
         self.is_loading = False
         self.initial_pdf_path = pdf_path
         self.reading_direction = reading_direction
         self.is_fullscreen = False
         # Handle bookshelf file path for both .exe and Python script execution
-        if getattr(sys, 'frozen', False):
-            # Running as .exe - data folder should be next to executable
-            base_path = os.path.dirname(sys.executable)
-        else:
-            # Running as Python script
-            base_path = os.path.dirname(os.path.abspath(__file__))
-        
-        self.bookshelf_file = os.path.join(base_path, "data", "bookshelf.json")  # For saving bookmarks
-        self.last_bookmark_save = 0  # Track when we last saved bookmark
+        base_path = app_base_path()
+        
+        self.bookshelf_file = os.path.join(base_path, "data", "bookshelf.json")  # Legacy data, migrated once
+        self.library_db = os.path.join(base_path, "data", "library.db")  # For saving bookmarks
+        # Rendered pages kept between sessions, so reopening at the bookmark needs no rendering
+        self.fingerprint = None  # Identifies the open PDF's contents in disk cache entries
+        self.disk_loads = set()  # Page cache keys being read back from the disk cache
+        self.disk_cache = host.disk_cache if host else create_disk_cache(base_path)
+        self.store = None  # Opened lazily when a bookmark is first read or written
+        self.writer = None  # Background, coalescing writes to the store
+        self.book_id = None  # Library id of the open PDF, if it is on the bookshelf
+        self.display_after_id = None  # Pending redraw after page turns
+        self.last_display_time = 0
+        self.bookmark_after_id = None  # Pending bookmark save after page turns
+        
+        # Push bookmark/favorite events to the bookshelf when launched from it
+        self.channel = host.channel if host else ReaderChannelClient.from_environment()
         
         # お気に入りページ機能
         self.favorite_pages = []  # Current book's favorite pages
@@ -52,6 +125,9 @@ class FullscreenReader:
         # Set up periodic auto-save (every 30 seconds)
         self.root.after(30000, self.periodic_bookmark_save)
         
+        # Shrink the page cache if memory runs low
+        self.root.after(2000, self.watch_memory)
+        
         # Auto-save on focus loss (when user switches to another app)
         self.root.bind("<FocusOut>", self.on_focus_lost)
         
@@ -115,9 +191,13 @@ class FullscreenReader:
             fg='white'
         )
         
-        # Bind click events for navigation
-        self.left_canvas.bind("<Button-1>", lambda e: self.prev_page())
-        self.right_canvas.bind("<Button-1>", lambda e: self.next_page())
+        # Bind click events for navigation (dragging pans a zoomed-in page instead)
+        self.left_canvas.bind("<ButtonPress-1>", self.on_drag_start)
+        self.right_canvas.bind("<ButtonPress-1>", self.on_drag_start)
+        self.left_canvas.bind("<B1-Motion>", self.on_drag_motion)
+        self.right_canvas.bind("<B1-Motion>", self.on_drag_motion)
+        self.left_canvas.bind("<ButtonRelease-1>", lambda e: self.on_click_release(self.prev_page))
+        self.right_canvas.bind("<ButtonRelease-1>", lambda e: self.on_click_release(self.next_page))
         
         # Hide status after 3 seconds
         self.root.after(3000, self.hide_status)
@@ -180,6 +260,9 @@ class FullscreenReader:
         self.root.bind('<g>', lambda e: self.show_goto_favorite())
         self.root.bind('<G>', lambda e: self.show_goto_favorite())
         
+        # Page cache statistics
+        self.root.bind('<F12>', lambda e: self.show_cache_stats())
+        
         self.root.focus_set()
     
     def show_help(self):
@@ -195,6 +278,7 @@ Zoom:
   +/=              Zoom in
   -                Zoom out
   0                Fit to window
+  Drag             Pan a zoomed-in page
 
 File:
   O                Open PDF
@@ -202,6 +286,7 @@ File:
 View:
   F / F11 / Esc    Toggle fullscreen
   H / ?            Show this help
+  F12              Show page cache statistics
   
 Bookmark:
   B                Save bookmark manually
@@ -237,6 +322,21 @@ Bookmarks are saved automatically when changing pages"""
         self.show_status("Exited fullscreen mode", 2000)
     
     def quit_app(self):
+        if self.closed:
+            return
+        self.closed = True
+        if self.render_service:
+            self.render_service.stop()
+        self.close_store()
+        self.close_channel()
+        if self.host:
+            # Only this window goes; the resident reader keeps running
+            self.canvas_keys = {}
+            self.host.reader_closed(self)
+            self.root.destroy()
+            return
+        if self.disk_cache:
+            self.disk_cache.close()
         self.root.quit()
     
     def open_pdf(self):
@@ -267,7 +367,13 @@ Bookmarks are saved automatically when changing pages"""
                 self.root.after(0, lambda: self.loading_label.configure(text="📂 Opening PDF file..."))
                 self.pdf_document = fitz.open(file_path)
                 self.total_pages = len(self.pdf_document)
-                self.page_images = {}
+                if self.render_service:
+                    self.render_service.stop()
+                self.render_service = self.create_render_service(file_path)
+                self.page_cache.discard_document(self.doc_token)
+                self.doc_token = file_path
+                self.page_sizes = {}
+                self.fingerprint = self.fingerprint_pdf(file_path)
                 
                 # Stage 2: Prepare for rendering
                 self.root.after(0, lambda: self.loading_label.configure(text=f"📋 Processing {self.total_pages} pages..."))
@@ -279,13 +385,9 @@ Bookmarks are saved automatically when changing pages"""
                 else:
                     self.current_page = 0  # Reset to cover page if invalid
                 
-                # Stage 3: Render initial pages
+                # Stage 3: Render initial pages (at canvas size, in update_display)
                 self.root.after(0, lambda: self.loading_label.configure(text="🎨 Rendering pages..."))
                 
-                # Pre-render only the current page for immediate display  
-                if self.total_pages > 0:
-                    self.render_page(self.current_page)
-                
                 filename = os.path.basename(file_path)
                 self.root.after(0, self.on_pdf_loaded, filename)
                 
@@ -298,41 +400,121 @@ Bookmarks are saved automatically when changing pages"""
         
         threading.Thread(target=load_worker, daemon=True).start()
     
+    def create_render_service(self, file_path):
+        """Process pool if configured (multi-core machines), otherwise one render thread"""
+        if self.host:
+            if self.host.render_pool:
+                return self.host.render_pool.client(file_path)
+            return RenderService(self.root, file_path)
+        pool = create_render_pool(self.root)
+        if pool:
+            return pool.client(file_path, owns_pool=True)
+        return RenderService(self.root, file_path)
+    
+    def fingerprint_pdf(self, file_path):
+        if not self.disk_cache:
+            return None
+        try:
+            return DiskPageCache.fingerprint(file_path)
+        except OSError as e:
+            print(f"Error fingerprinting {file_path}: {e}")
+            return None
+    
     def preload_initial_pages(self):
         """Preload nearby pages after initial display is ready"""
-        def preload_worker():
-            try:
-                # Preload next page for smooth navigation
-                if self.current_page + 1 < self.total_pages:
-                    self.render_page(self.current_page + 1)
-                
-                # Preload a few more pages in background
-                for i in range(max(0, self.current_page - 1), min(self.total_pages, self.current_page + 4)):
-                    if i not in self.page_images:
-                        self.render_page(i)
-            except Exception as e:
-                print(f"Error preloading pages: {e}")
-        
-        threading.Thread(target=preload_worker, daemon=True).start()
+        self.preload_nearby_pages()
+    
+    def request_page(self, page_num, canvas_width, canvas_height, priority):
+        """Ask the render service for a page at display size unless it is cached"""
+        if not self.render_service or not 0 <= page_num < self.total_pages:
+            return None
+        key = self.page_key(page_num, canvas_width, canvas_height)
+        if key in self.page_cache or key in self.disk_loads:
+            return key
+        disk_name = self.disk_name(key)
+        if disk_name and disk_name in self.disk_cache:
+            # Rendered in an earlier session: read it back instead of rendering
+            self.disk_loads.add(key)
+            self.disk_cache.load(disk_name, lambda ppm_data: self.root.after(0, self.on_page_loaded, key, ppm_data))
+        else:
+            self.render_service.request(key, ('page', page_num, canvas_width, canvas_height, self.display_scale),
+                                        priority, self.on_page_rendered)
+        return key
+    
+    def on_page_rendered(self, key, ppm_data, seconds=None):
+        """Cache a finished render and draw it if its canvas is still waiting for it"""
+        self.prefetcher.record_render(seconds)
+        photo = self.cache_page_photo(key, ppm_data) if ppm_data else None
+        disk_name = self.disk_name(key)
+        if photo is not None and disk_name:
+            self.disk_cache.put(disk_name, ppm_data)
+        self.show_finished_page(key, photo)
+    
+    def on_page_loaded(self, key, ppm_data):
+        """A page read back from the disk cache; render it after all if the file was gone"""
+        self.disk_loads.discard(key)
+        if ppm_data:
+            self.show_finished_page(key, self.cache_page_photo(key, ppm_data))
+        elif self.render_service and key[0] == self.doc_token:
+            job = ('page', key[1], key[2], key[3], key[4])
+            self.render_service.request(key, job, 1, self.on_page_rendered)
+    
+    def show_finished_page(self, key, photo):
+        for canvas, shown_key in self.canvas_keys.items():
+            if shown_key == key:
+                canvas.delete("all")
+                if photo is None:
+                    self.display_page_error(canvas, key[1], key[2], key[3])
+                else:
+                    self.draw_page_photo(canvas, photo, key[2], key[3])
+    
+    def request_preview(self, page_num, canvas_width, canvas_height):
+        """Ask for a cheap low-resolution render, ahead of everything else"""
+        key = self.preview_key(self.page_key(page_num, canvas_width, canvas_height))
+        if key not in self.page_cache:
+            job = ('page', page_num, canvas_width // PREVIEW_FACTOR, canvas_height // PREVIEW_FACTOR,
+                   self.display_scale)
+            self.render_service.request(key, job, -1, self.on_preview_rendered)
     
-    def render_page(self, page_num):
-        """Render a PDF page to PIL Image"""
-        if page_num in self.page_images or page_num >= self.total_pages or page_num < 0:
+    def on_preview_rendered(self, key, ppm_data, seconds=None):
+        """Show a preview on any canvas still waiting for the full render of its page"""
+        if not ppm_data:
             return
-        
-        try:
-            page = self.pdf_document[page_num]
-            # Use adaptive resolution based on page size for better performance
-            mat = fitz.Matrix(1.5, 1.5)  # Reduced from 2.0 for faster rendering
-            pix = page.get_pixmap(matrix=mat)
-            img_data = pix.tobytes("ppm")
-            
-            # Convert to PIL Image
-            pil_image = Image.open(tk_io.BytesIO(img_data))
-            self.page_images[page_num] = pil_image
-            
-        except Exception as e:
-            print(f"Error rendering page {page_num}: {e}")
+        photo = self.cache_page_photo(key, ppm_data)
+        for canvas, shown_key in self.canvas_keys.items():
+            if self.preview_key(shown_key) == key and shown_key not in self.page_cache:
+                canvas.delete("all")
+                self.draw_page_photo(canvas, photo.zoom(PREVIEW_FACTOR), key[3], key[4])
+    
+    def disk_name(self, key):
+        """Disk cache entry name for a page cache key, or None without a disk cache"""
+        if not self.disk_cache or not self.fingerprint or key[0] != self.doc_token:
+            return None
+        return DiskPageCache.entry_name(self.fingerprint, key[1], key[2], key[3], key[4])
+    
+    def protects(self, key):
+        """True for page cache entries on screen in this window (never evicted)"""
+        return (key[0] == self.doc_token and key[1] in self.displayed_pages and
+                (key[2] != 'tile' or key in self.visible_tiles))
+    
+    def page_canvas_size(self):
+        return self.left_canvas.winfo_width(), self.left_canvas.winfo_height()
+    
+    @staticmethod
+    def preview_key(key):
+        """Page cache key of the low-resolution preview for a full render key"""
+        return key[:2] + ('preview',) + key[2:]
+    
+    def page_key(self, page_num, canvas_width, canvas_height):
+        """Page cache key of a page drawn into a canvas of this size at the current zoom"""
+        return (self.doc_token, page_num, canvas_width, canvas_height, self.display_scale, self.device_scale)
+    
+    def cache_page_photo(self, key, ppm_data):
+        """Wrap rendered PPM bytes in a PhotoImage and cache it (Tk thread only)"""
+        photo = tk.PhotoImage(data=ppm_data, format='PPM')
+        # Tk keeps photo images as 32-bit pixels
+        self.page_cache.put(key, photo, photo.width() * photo.height() * 4)
+        return photo
     
     def show_initial_loading(self, filename):
         """Show immediate loading state when PDF is being opened"""
@@ -385,11 +567,13 @@ Bookmarks are saved automatically when changing pages"""
         
         self.left_canvas.delete("all")
         self.right_canvas.delete("all")
+        self.canvas_keys = {}
+        self.visible_tiles = set()
         
         # Get canvas dimensions
         self.root.update_idletasks()
-        canvas_width = self.left_canvas.winfo_width()
-        canvas_height = self.left_canvas.winfo_height()
+        canvas_width, canvas_height = self.page_canvas_size()
+        self.device_scale = self.root.winfo_fpixels('1i') / 96.0
         
         if canvas_width <= 1 or canvas_height <= 1:
             self.root.after(100, self.update_display)
@@ -424,6 +608,10 @@ Bookmarks are saved automatically when changing pages"""
                 left_page_idx = self.current_page + 1
                 right_page_idx = self.current_page
         
+        # Keep the pages on screen, and those nearest them, in the page cache
+        self.displayed_pages = {idx for idx in (left_page_idx, right_page_idx) if 0 <= idx < self.total_pages}
+        self.page_cache.set_focus(self.doc_token, self.current_page, self.nav_direction)
+        
         # Display left page (or blank if virtual)
         if left_page_idx == -1:
             self.display_blank_page(self.left_canvas, canvas_width, canvas_height)
@@ -441,46 +629,205 @@ Bookmarks are saved automatically when changing pages"""
             self.right_canvas.delete("all")
     
     def display_page_on_canvas(self, canvas, page_idx, canvas_width, canvas_height):
-        # Render page if not already rendered
-        if page_idx not in self.page_images:
-            self.render_page(page_idx)
+        if self.display_scale > 1:
+            # Zoomed in: render only the visible part, crisp at the real zoom factor
+            self.display_tiled_page(canvas, page_idx, canvas_width, canvas_height)
+            return
+        
+        # Revisited spreads come straight from the cache: no rendering, no resampling
+        key = self.page_key(page_idx, canvas_width, canvas_height)
+        self.canvas_keys[canvas] = key
+        photo = self.page_cache.get(key)
+        if photo is None:
+            photo = self.load_page_from_disk(key)
+        if photo is not None:
+            self.draw_page_photo(canvas, photo, canvas_width, canvas_height)
+            return
         
-        if page_idx not in self.page_images:
-            # Display error message if rendering failed
+        # Not rendered yet: show a zoomed-up low-resolution preview right away
+        # (rendered first if needed) and swap in the full page when it arrives
+        preview = self.page_cache.peek(self.preview_key(key))
+        if preview is not None:
+            self.draw_page_photo(canvas, preview.zoom(PREVIEW_FACTOR), canvas_width, canvas_height)
+        else:
+            self.request_preview(page_idx, canvas_width, canvas_height)
             canvas.create_text(
                 canvas_width // 2, canvas_height // 2,
-                text=f"Error loading page {page_idx + 1}",
-                font=("Arial", 16),
-                fill="red"
+                text=f"Loading page {page_idx + 1}...",
+                font=("Arial", 14),
+                fill="#888888"
             )
+        self.request_page(page_idx, canvas_width, canvas_height, 0)
+    
+    def display_tiled_page(self, canvas, page_idx, canvas_width, canvas_height):
+        """Draw the tiles of a zoomed-in page that overlap the view, requesting missing ones"""
+        zoom, page_width, page_height, view_x, view_y = self.tile_layout(page_idx, canvas_width, canvas_height)
+        self.canvas_keys[canvas] = (self.doc_token, page_idx, 'tiles', zoom, canvas_width, canvas_height)
+        canvas.delete("all")
+        canvas.image = []  # Store references to prevent garbage collection
+        
+        visible = self.tiles_in_view(page_width, page_height, view_x, view_y, canvas_width, canvas_height)
+        for tile_x, tile_y in visible:
+            key = self.tile_key(page_idx, zoom, tile_x, tile_y)
+            self.visible_tiles.add(key)
+            x = round(tile_x * TILE_SIZE - view_x)
+            y = round(tile_y * TILE_SIZE - view_y)
+            photo = self.page_cache.get(key)
+            if photo is not None:
+                canvas.image.append(photo)
+                canvas.create_image(x, y, anchor=tk.NW, image=photo)
+            else:
+                # Placeholder until the tile arrives
+                canvas.create_rectangle(
+                    x, y,
+                    x + min(TILE_SIZE, page_width - tile_x * TILE_SIZE),
+                    y + min(TILE_SIZE, page_height - tile_y * TILE_SIZE),
+                    fill='#eeeeee', outline=''
+                )
+                self.request_tile(page_idx, zoom, tile_x, tile_y, 0)
+        
+        # Prefetch a ring of tiles around the view, those the view is moving toward first
+        first_x, first_y = visible[0] if visible else (0, 0)
+        last_x, last_y = visible[-1] if visible else (0, 0)
+        move_x, move_y = self.pan_direction
+        for tile_x, tile_y in self.tiles_in_view(page_width, page_height, view_x, view_y,
+                                                 canvas_width, canvas_height, margin=1):
+            if first_x <= tile_x <= last_x and first_y <= tile_y <= last_y:
+                continue
+            ahead = ((move_x > 0 and tile_x > last_x) or (move_x < 0 and tile_x < first_x) or
+                     (move_y > 0 and tile_y > last_y) or (move_y < 0 and tile_y < first_y))
+            self.request_tile(page_idx, zoom, tile_x, tile_y, 1 if ahead else 2)
+    
+    def tile_layout(self, page_idx, canvas_width, canvas_height):
+        """(zoom, page width, page height, view x, view y) in pixels for a zoomed-in page"""
+        width, height = self.page_size(page_idx)
+        # Same fit as a whole-page render, times the zoom level; rounded so tile keys repeat
+        zoom = round(min(canvas_width / width, canvas_height / height) * self.display_scale, 4)
+        page_width = width * zoom
+        page_height = height * zoom
+        return (zoom, page_width, page_height,
+                self.view_origin(self.pan_x, page_width, canvas_width),
+                self.view_origin(self.pan_y, page_height, canvas_height))
+    
+    @staticmethod
+    def view_origin(pan, page_extent, canvas_extent):
+        """Left/top edge of the view in page pixels (negative centres a page smaller than the canvas)"""
+        if page_extent <= canvas_extent:
+            return (page_extent - canvas_extent) / 2
+        return min(max(pan * page_extent - canvas_extent / 2, 0), page_extent - canvas_extent)
+    
+    @staticmethod
+    def tiles_in_view(page_width, page_height, view_x, view_y, canvas_width, canvas_height, margin=0):
+        """(tile x, tile y) of the tiles overlapping the view, widened by margin tiles, row by row"""
+        first_x = max(0, int(view_x // TILE_SIZE) - margin)
+        first_y = max(0, int(view_y // TILE_SIZE) - margin)
+        last_x = min(math.ceil(page_width / TILE_SIZE) - 1, int((view_x + canvas_width - 1) // TILE_SIZE) + margin)
+        last_y = min(math.ceil(page_height / TILE_SIZE) - 1, int((view_y + canvas_height - 1) // TILE_SIZE) + margin)
+        return [(tile_x, tile_y) for tile_y in range(first_y, last_y + 1) for tile_x in range(first_x, last_x + 1)]
+    
+    def page_size(self, page_idx):
+        size = self.page_sizes.get(page_idx)
+        if size is None:
+            rect = self.pdf_document[page_idx].rect
+            size = self.page_sizes[page_idx] = (rect.width, rect.height)
+        return size
+    
+    def tile_key(self, page_idx, zoom, tile_x, tile_y):
+        """Page cache key of one tile of a zoomed-in page"""
+        return (self.doc_token, page_idx, 'tile', zoom, tile_x, tile_y)
+    
+    def request_tile(self, page_idx, zoom, tile_x, tile_y, priority):
+        if not self.render_service:
             return
-        
-        page_image = self.page_images[page_idx].copy()
-        
-        # Calculate scaling to fit canvas perfectly
-        img_width, img_height = page_image.size
-        scale_x = (canvas_width * self.display_scale) / img_width
-        scale_y = (canvas_height * self.display_scale) / img_height
-        scale = min(scale_x, scale_y)
-        
-        new_width = int(img_width * scale)
-        new_height = int(img_height * scale)
-        
-        # Resize image
-        page_image = page_image.resize((new_width, new_height), Image.Resampling.LANCZOS)
-        
-        # Convert to PhotoImage
-        photo = ImageTk.PhotoImage(page_image)
-        
+        key = self.tile_key(page_idx, zoom, tile_x, tile_y)
+        if key not in self.page_cache:
+            self.render_service.request(key, ('tile', page_idx, zoom, tile_x, tile_y, TILE_SIZE),
+                                        priority, self.on_tile_rendered)
+    
+    def on_tile_rendered(self, key, ppm_data, seconds=None):
+        """Cache a finished tile and redraw the zoomed-in page it belongs to, if still shown"""
+        if not ppm_data:
+            return
+        self.cache_page_photo(key, ppm_data)
+        for canvas, shown_key in list(self.canvas_keys.items()):
+            if shown_key[:4] == (key[0], key[1], 'tiles', key[3]):
+                self.display_tiled_page(canvas, key[1], shown_key[4], shown_key[5])
+    
+    def refresh_tiled_view(self):
+        """Redraw zoomed-in pages after a pan; tiles queued for the old view are dropped"""
+        if self.render_service:
+            self.render_service.reset()
+        self.visible_tiles = set()
+        for canvas, shown_key in list(self.canvas_keys.items()):
+            if shown_key[2] == 'tiles':
+                self.display_tiled_page(canvas, shown_key[1], shown_key[4], shown_key[5])
+    
+    def on_drag_start(self, event):
+        self.drag = {'x': event.x, 'y': event.y, 'pan_x': self.pan_x, 'pan_y': self.pan_y, 'moved': False}
+    
+    def on_drag_motion(self, event):
+        """Pan a zoomed-in page with the mouse (both pages of the spread move together)"""
+        shown_key = self.canvas_keys.get(event.widget)
+        if self.drag is None or shown_key is None or shown_key[2] != 'tiles':
+            return
+        dx = event.x - self.drag['x']
+        dy = event.y - self.drag['y']
+        if not self.drag['moved'] and abs(dx) + abs(dy) < 5:
+            return  # Still a click
+        self.drag['moved'] = True
+        
+        width, height = self.page_size(shown_key[1])
+        zoom, canvas_width, canvas_height = shown_key[3], shown_key[4], shown_key[5]
+        pan_x = self.clamp_pan(self.drag['pan_x'] - dx / (width * zoom), width * zoom, canvas_width)
+        pan_y = self.clamp_pan(self.drag['pan_y'] - dy / (height * zoom), height * zoom, canvas_height)
+        if (pan_x, pan_y) == (self.pan_x, self.pan_y):
+            return
+        self.pan_direction = ((pan_x > self.pan_x) - (pan_x < self.pan_x),
+                              (pan_y > self.pan_y) - (pan_y < self.pan_y))
+        self.pan_x, self.pan_y = pan_x, pan_y
+        self.refresh_tiled_view()
+    
+    @staticmethod
+    def clamp_pan(pan, page_extent, canvas_extent):
+        """Keep the view centre where the view still lies within the page"""
+        if page_extent <= canvas_extent:
+            return 0.5
+        half = canvas_extent / (2 * page_extent)
+        return min(max(pan, half), 1 - half)
+    
+    def on_click_release(self, turn_page):
+        """A click without a drag turns the page"""
+        drag, self.drag = self.drag, None
+        if drag is not None and not drag['moved']:
+            turn_page()
+    
+    def load_page_from_disk(self, key):
+        """Page rendered in an earlier session, read synchronously (it is about to be shown)"""
+        disk_name = self.disk_name(key)
+        if disk_name is None or disk_name not in self.disk_cache:
+            return None
+        ppm_data = self.disk_cache.get(disk_name)
+        return self.cache_page_photo(key, ppm_data) if ppm_data else None
+    
+    def draw_page_photo(self, canvas, photo, canvas_width, canvas_height):
         # Store reference to prevent garbage collection
         canvas.image = photo
         
         # Center the image on canvas
-        x = (canvas_width - new_width) // 2
-        y = (canvas_height - new_height) // 2
+        x = (canvas_width - photo.width()) // 2
+        y = (canvas_height - photo.height()) // 2
         
         canvas.create_image(x, y, anchor=tk.NW, image=photo)
     
+    def display_page_error(self, canvas, page_idx, canvas_width, canvas_height):
+        # Display error message if rendering failed
+        canvas.create_text(
+            canvas_width // 2, canvas_height // 2,
+            text=f"Error loading page {page_idx + 1}",
+            font=("Arial", 16),
+            fill="red"
+        )
+    
     def display_blank_page(self, canvas, canvas_width, canvas_height):
         """Display a blank page (virtual page)"""
         canvas.delete("all")
@@ -501,19 +848,8 @@ Bookmarks are saved automatically when changing pages"""
         else:
             # Normal page going back by 2
             self.current_page = max(0, self.current_page - 2)
-        
-        # Pre-render nearby pages
-        self.preload_nearby_pages()
-        
-        self.update_display()
-        self.show_page_status()
-        
-        # Auto-save bookmark (throttled)
-        import time
-        current_time = time.time()
-        if current_time - self.last_bookmark_save > 2:  # Save at most every 2 seconds
-            self.save_bookmark()
-            self.last_bookmark_save = current_time
+        self.on_page_turn(-1)
+        self.request_display()
     
     def next_page(self):
         if not self.pdf_document:
@@ -529,19 +865,8 @@ Bookmarks are saved automatically when changing pages"""
         else:
             # Don't advance if we're at or near the end
             return
-            
-        # Pre-render nearby pages
-        self.preload_nearby_pages()
-        
-        self.update_display()
-        self.show_page_status()
-        
-        # Auto-save bookmark (throttled)
-        import time
-        current_time = time.time()
-        if current_time - self.last_bookmark_save > 2:  # Save at most every 2 seconds
-            self.save_bookmark()
-            self.last_bookmark_save = current_time
+        self.on_page_turn(1)
+        self.request_display()
     
     def show_page_status(self):
         if not self.pdf_document:
@@ -591,32 +916,112 @@ Bookmarks are saved automatically when changing pages"""
         
         self.show_status(f"{status} {direction_text}{favorite_indicator}", 2000)
     
+    def on_page_turn(self, direction):
+        """Feed the prefetcher the turn (for the reading pace)"""
+        self.nav_direction = direction
+        self.prefetcher.record_turn(direction)
+    
+    def request_display(self):
+        """Redraw after page turns, at most once per frame, so only the latest spread is drawn"""
+        if self.display_after_id is not None:
+            return  # Turns until then just move current_page
+        elapsed_ms = (time.monotonic() - self.last_display_time) * 1000
+        self.display_after_id = self.root.after(max(0, int(NAV_FRAME_MS - elapsed_ms)), self.show_turned_page)
+    
+    def show_turned_page(self):
+        self.display_after_id = None
+        if self.closed or not self.pdf_document:
+            return
+        self.last_display_time = time.monotonic()
+        
+        # Tell the prefetcher whether the spread was already rendered
+        canvas_width, canvas_height = self.page_canvas_size()
+        for page_num in self.prefetcher.spread_pages(self.current_page, self.total_pages):
+            self.prefetcher.record_display(self.page_key(page_num, canvas_width, canvas_height) in self.page_cache)
+        
+        # Pre-render nearby pages (renders queued for skipped spreads are dropped)
+        self.preload_nearby_pages()
+        
+        self.update_display()
+        self.show_page_status()
+        self.schedule_bookmark_save()
+    
+    def schedule_bookmark_save(self):
+        """Save the position once page turning stops, not on every turn"""
+        if self.bookmark_after_id is not None:
+            self.root.after_cancel(self.bookmark_after_id)
+        self.bookmark_after_id = self.root.after(BOOKMARK_DELAY_MS, self.save_pending_bookmark)
+    
+    def save_pending_bookmark(self):
+        self.bookmark_after_id = None
+        if not self.closed:
+            self.save_bookmark()
+    
     def preload_nearby_pages(self):
         """Pre-render nearby pages for smooth navigation"""
-        # Reduce preload range for better performance
-        start_page = max(0, self.current_page - 1)
-        end_page = min(self.total_pages, self.current_page + 3)
+        if not self.render_service:
+            return
+        canvas_width, canvas_height = self.page_canvas_size()
+        if canvas_width <= 1 or canvas_height <= 1:
+            return
         
-        # Use background thread for preloading to avoid UI blocking
-        def preload_worker():
-            for i in range(start_page, end_page):
-                if i not in self.page_images:
-                    self.render_page(i)
+        # Anything still queued for the previous position no longer matters
+        self.render_service.reset()
+        if self.display_scale > 1:
+            return  # Zoomed in: only tiles in and around the view are rendered
         
-        threading.Thread(target=preload_worker, daemon=True).start()
+        # Window sized by the prefetcher; a render pool finishes more pages per turn
+        workers = getattr(self.render_service, 'workers', 1)
+        for page_num, priority in self.prefetcher.plan(self.current_page, self.total_pages, workers):
+            self.request_page(page_num, canvas_width, canvas_height, priority)
+    
+    def show_cache_stats(self):
+        """Show page cache counters in the status bar (for tuning the budget)"""
+        stats = self.page_cache.stats()
+        rss = f" • RSS {stats['rss'] / 1048576:.0f} MB" if stats['rss'] else ""
+        self.show_status(
+            f"Page cache: {stats['entries']} pages • {stats['bytes'] / 1048576:.1f}/{stats['budget'] / 1048576:.0f} MB • "
+            f"hit {stats['hits']} / miss {stats['misses']} ({stats['hit_rate']:.0%}) • "
+            f"evicted {stats['evictions']} • trims {stats['pressure_trims']}{rss} | "
+            f"{self.prefetch_status()}{self.disk_cache_status()}", 5000)
+    
+    def prefetch_status(self):
+        stats = self.prefetcher.stats(getattr(self.render_service, 'workers', 1))
+        turn = f"{stats['turn_s']:.1f}s/turn" if stats['turn_s'] else "no turns yet"
+        return (f"Prefetch: +{stats['ahead']}/-{stats['behind']} spreads • hit {stats['hit_rate']:.0%} "
+                f"({stats['hits']}/{stats['hits'] + stats['misses']}) • {stats['render_ms']:.0f} ms/page • {turn}")
+    
+    def disk_cache_status(self):
+        if not self.disk_cache:
+            return ""
+        stats = self.disk_cache.stats()
+        return (f" | Disk: {stats['entries']} pages • {stats['bytes'] / 1048576:.0f}/{stats['budget'] / 1048576:.0f} MB • "
+                f"{stats['hits']} pages reused")
+    
+    def watch_memory(self):
+        """Trim the page cache when the process or the system runs short of memory"""
+        if self.closed:
+            return
+        if self.page_cache.check_memory():
+            print(f"Memory low - page cache trimmed to {self.page_cache.total / 1048576:.0f} MB")
+        self.root.after(2000, self.watch_memory)
     
     def zoom_in(self):
         self.display_scale = min(self.display_scale * 1.2, 3.0)
+        self.preload_nearby_pages()
         self.update_display()
         self.show_status(f"Zoom: {int(self.display_scale * 100)}%", 1500)
     
     def zoom_out(self):
         self.display_scale = max(self.display_scale / 1.2, 0.3)
+        self.preload_nearby_pages()
         self.update_display()
         self.show_status(f"Zoom: {int(self.display_scale * 100)}%", 1500)
     
     def fit_to_window(self):
         self.display_scale = 1.0
+        self.pan_x = self.pan_y = 0.5
+        self.preload_nearby_pages()
         self.update_display()
         self.show_status("Fit to window", 1500)
     
@@ -626,42 +1031,60 @@ Bookmarks are saved automatically when changing pages"""
             return
         
         try:
-            import json
             from datetime import datetime
             
-            # Load existing bookshelf data
-            books = []
-            if os.path.exists(self.bookshelf_file):
-                with open(self.bookshelf_file, 'r', encoding='utf-8') as f:
-                    books = json.load(f)
-            else:
-                return
+            writer = self.get_writer()
+            if writer is None or self.book_id is None:
+                return  # Not a book on the shelf
             
-            # Find and update the current book (normalize paths for comparison)
-            book_found = False
-            normalized_current_path = os.path.normpath(self.initial_pdf_path)
-            for book in books:
-                normalized_book_path = os.path.normpath(book['path'])
-                if normalized_book_path == normalized_current_path:
-                    # Convert virtual page to actual PDF page for storage
-                    actual_pdf_page = self.get_actual_pdf_page(self.current_page)
-                    book['last_page'] = actual_pdf_page
-                    book['last_opened'] = datetime.now().isoformat()
-                    book_found = True
-                    print(f"DEBUG: Saving bookmark - virtual page: {self.current_page}, actual PDF page: {actual_pdf_page}")
-                    break
+            # Convert virtual page to actual PDF page for storage
+            actual_pdf_page = self.get_actual_pdf_page(self.current_page)
             
-            if not book_found:
-                return
-            
-            # Save updated data
-            os.makedirs(os.path.dirname(self.bookshelf_file), exist_ok=True)
-            with open(self.bookshelf_file, 'w', encoding='utf-8') as f:
-                json.dump(books, f, indent=2, ensure_ascii=False)
+            # Queued; repeated saves before the next flush become one indexed UPDATE
+            last_opened = datetime.now().isoformat()
+            writer.update_bookmark(self.initial_pdf_path, actual_pdf_page, last_opened)
+            print(f"DEBUG: Saving bookmark - virtual page: {self.current_page}, actual PDF page: {actual_pdf_page}")
+            self.publish_event('position', last_page=actual_pdf_page, last_opened=last_opened)
                 
         except Exception as e:
             print(f"Error saving bookmark: {e}")
     
+    def publish_event(self, event_type, **payload):
+        """Tell the bookshelf (if it launched us) about a change to this book"""
+        if self.channel and self.book_id:
+            self.channel.publish(event_type, self.book_id, **payload)
+    
+    def close_channel(self):
+        """Let the bookshelf drop this book's subscription"""
+        if self.channel:
+            self.publish_event('closed')
+            if not self.host:
+                self.channel.close()  # A resident reader's channel is shared
+            self.channel = None
+    
+    def get_store(self):
+        """Open the shared library database, or None if there is no library yet"""
+        if self.store is None:
+            if not os.path.exists(self.library_db) and not os.path.exists(self.bookshelf_file):
+                return None
+            self.store = LibraryStore(self.library_db, self.bookshelf_file)
+        return self.store
+    
+    def get_writer(self):
+        """Write-behind queue in front of the store, or None if there is no library yet"""
+        if self.writer is None and self.get_store() is not None:
+            self.writer = WriteBehindQueue(self.store)
+        return self.writer
+    
+    def close_store(self):
+        """Write pending bookmark/favorite changes and close the database"""
+        if self.writer:
+            self.writer.close()
+            self.writer = None
+        if self.store:
+            self.store.close()
+            self.store = None
+    
     def get_actual_pdf_page(self, virtual_page):
         """Convert virtual page number to actual PDF page number"""
         if virtual_page == 0:
@@ -705,7 +1128,7 @@ Bookmarks are saved automatically when changing pages"""
                 print(f"Error saving bookmark on close: {e}")
                 # Still quit even if bookmark save fails
                 
-        self.root.quit()
+        self.quit_app()
     
     def complete_closing(self):
         """Complete the closing process after bookmark is saved"""
@@ -714,10 +1137,12 @@ Bookmarks are saved automatically when changing pages"""
         self.root.update()
         
         # Give user a moment to see the confirmation
-        self.root.after(300, self.root.quit)
+        self.root.after(300, self.quit_app)
     
     def periodic_bookmark_save(self):
         """Periodically save bookmark in background"""
+        if self.closed:
+            return
         if self.pdf_document and self.initial_pdf_path:
             try:
                 self.save_bookmark()
@@ -757,18 +1182,17 @@ Bookmarks are saved automatically when changing pages"""
             return
         
         try:
-            import json
-            if os.path.exists(self.bookshelf_file):
-                with open(self.bookshelf_file, 'r', encoding='utf-8') as f:
-                    books = json.load(f)
-                
-                normalized_current_path = os.path.normpath(self.initial_pdf_path)
-                for book in books:
-                    normalized_book_path = os.path.normpath(book['path'])
-                    if normalized_book_path == normalized_current_path:
-                        self.favorite_pages = book.get('favorite_pages', [])
-                        print(f"DEBUG: Loaded {len(self.favorite_pages)} favorite pages")
-                        break
+            store = self.get_store()
+            if store is None:
+                return
+            
+            book = store.find_book_by_path(self.initial_pdf_path)
+            if book:
+                self.book_id = book['id']
+                self.favorite_pages = book.get('favorite_pages', [])
+                if self.channel:
+                    self.channel.subscribe(self.book_id)
+                print(f"DEBUG: Loaded {len(self.favorite_pages)} favorite pages")
         except Exception as e:
             print(f"Error loading favorite pages: {e}")
     
@@ -778,24 +1202,13 @@ Bookmarks are saved automatically when changing pages"""
             return
         
         try:
-            import json
-            books = []
-            if os.path.exists(self.bookshelf_file):
-                with open(self.bookshelf_file, 'r', encoding='utf-8') as f:
-                    books = json.load(f)
-            else:
+            writer = self.get_writer()
+            if writer is None or self.book_id is None:
                 return
             
-            normalized_current_path = os.path.normpath(self.initial_pdf_path)
-            for book in books:
-                normalized_book_path = os.path.normpath(book['path'])
-                if normalized_book_path == normalized_current_path:
-                    book['favorite_pages'] = self.favorite_pages
-                    break
-            
-            os.makedirs(os.path.dirname(self.bookshelf_file), exist_ok=True)
-            with open(self.bookshelf_file, 'w', encoding='utf-8') as f:
-                json.dump(books, f, indent=2, ensure_ascii=False)
+            # Rewrites only this book's favorite rows (in the background)
+            writer.set_favorites(self.book_id, self.favorite_pages)
+            self.publish_event('favorites', favorite_pages=self.favorite_pages)
                 
         except Exception as e:
             print(f"Error saving favorite pages: {e}")
@@ -855,6 +1268,17 @@ Bookmarks are saved automatically when changing pages"""
         
         self.create_favorites_popup()
     
+    def show_pdf_page(self, pdf_page, reading_direction=None):
+        """Move to a PDF page (the shelf opened this book again at a specific page)"""
+        if reading_direction:
+            self.reading_direction = reading_direction
+        if not self.pdf_document:
+            self.start_pdf_page = pdf_page  # Still loading; used once the PDF is open
+            return
+        if 0 <= pdf_page < self.total_pages:
+            self.current_page = self.get_virtual_page_from_pdf(pdf_page)
+            self.request_display()
+    
     def jump_to_favorite(self, index):
         """Jump to favorite page by index"""
         if 0 <= index < len(self.favorite_pages):
@@ -1025,15 +1449,89 @@ Bookmarks are saved automatically when changing pages"""
             self.save_favorite_pages()
             self.show_status(f"⭐ Removed '{removed_fav['name']}' from favorites", 2000)
 
+class ReaderHost:
+    """Resident reader process for the bookshelf.
+
+    Started once with --host; every book opened from the shelf after that
+    arrives as an 'open' command over the bookshelf channel and gets a
+    Toplevel window in this process, so there is no interpreter, Tk and
+    PyMuPDF startup per book. All windows share one page cache, one disk
+    cache and (if configured) one render pool. The process exits once the
+    bookshelf has gone away and the last window is closed.
+    """
+
+    def __init__(self, root, channel):
+        self.root = root
+        self.root.withdraw()  # Only the reader windows are shown
+        self.channel = channel
+        self.readers = []
+        self.shelf_connected = channel is not None
+        self.page_cache = create_page_cache(lambda key: any(reader.protects(key) for reader in self.readers))
+        self.disk_cache = create_disk_cache(app_base_path())
+        self.render_pool = create_render_pool(root)
+        if channel:
+            channel.register_host(lambda message: self.root.after(0, self.on_command, message),
+                                  lambda: self.root.after(0, self.on_shelf_lost))
+
+    def on_command(self, message):
+        if message.get('type') == 'open' and message.get('path'):
+            self.open(message['path'], message.get('reading_direction', 'left_to_right'),
+                      int(message.get('start_page') or 0), bool(message.get('jump')))
+
+    def open(self, pdf_path, reading_direction='left_to_right', start_page=0, jump=False):
+        """Show the book in a new reader window, or raise the one it is already open in
+        (moving it to start_page if jump: a content search hit rather than the bookmark)"""
+        for reader in self.readers:
+            if reader.initial_pdf_path == pdf_path:
+                if jump:
+                    reader.show_pdf_page(start_page, reading_direction)
+                reader.root.deiconify()
+                reader.root.lift()
+                reader.root.focus_force()
+                return
+        window = tk.Toplevel(self.root)
+        self.readers.append(FullscreenReader(window, pdf_path, reading_direction, start_page, host=self))
+
+    def reader_closed(self, reader):
+        if reader in self.readers:
+            self.readers.remove(reader)
+        self.exit_if_idle()
+
+    def on_shelf_lost(self):
+        self.shelf_connected = False
+        self.exit_if_idle()
+
+    def exit_if_idle(self):
+        if self.readers or self.shelf_connected:
+            return
+        if self.render_pool:
+            self.render_pool.shutdown()
+        if self.disk_cache:
+            self.disk_cache.close()
+        self.root.quit()
+
 def main():
     import sys
-    pdf_path = sys.argv[1] if len(sys.argv) > 1 else None
-    reading_direction = sys.argv[2] if len(sys.argv) > 2 else 'left_to_right'
-    start_page = int(sys.argv[3]) if len(sys.argv) > 3 else 0
+    args = sys.argv[1:]
+    hosted = bool(args) and args[0] == '--host'
+    if hosted:
+        args = args[1:]
+    pdf_path = args[0] if len(args) > 0 else None
+    reading_direction = args[1] if len(args) > 1 else 'left_to_right'
+    start_page = int(args[2]) if len(args) > 2 else 0
     
     root = tk.Tk()
-    app = FullscreenReader(root, pdf_path, reading_direction, start_page)
+    if hosted:
+        # Resident reader: later books arrive over the bookshelf channel
+        host = ReaderHost(root, ReaderChannelClient.from_environment())
+        if pdf_path:
+            host.open(pdf_path, reading_direction, start_page)
+        else:
+            host.exit_if_idle()
+    else:
+        app = FullscreenReader(root, pdf_path, reading_direction, start_page)
     root.mainloop()
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # Render pool workers in the packaged .exe
     main()
\ No newline at end of file
@@ -0,0 +1,375 @@
+import math
+import bisect
+import itertools
+import threading
+from collections import OrderedDict
+from types import MappingProxyType
+from book import Book
+from library_store import normalize_path
+from search_index import TrigramIndex
+
+
+def recent_key(book):
+    return (-(getattr(book, 'last_opened_us', None) or 0), -(getattr(book, 'added_us', None) or 0))
+
+
+def added_key(book):
+    return -(getattr(book, 'added_us', None) or 0)
+
+
+def title_key(book):
+    return book['title'].lower()
+
+
+def custom_key(book):
+    order = book.get('custom_order')
+    return 999 if order is None else order
+
+
+def custom_order_between(before, after):
+    """Key strictly between two custom_order keys (None: that end of the list is open),
+    or None once floats can no longer split the gap"""
+    if before is None and after is None:
+        return 0
+    if before is None:
+        return math.floor(after) - 1
+    if after is None:
+        return math.floor(before) + 1
+    middle = (before + after) / 2
+    return middle if before < middle < after else None
+
+
+# Ascending sort keys per shelf sort mode (newest first for the date modes)
+SORT_KEYS = {'recent': recent_key, 'added': added_key, 'title': title_key, 'custom': custom_key}
+ORDER_FIELDS = frozenset(('title', 'added_date', 'last_opened', 'custom_order', 'category'))
+QUERY_CACHE_SIZE = 16
+
+
+class OrderedView:
+    """Book ids of one category (or the whole library) kept in one sort mode's order.
+
+    Entries are (sort key, sequence, book_id) tuples in a sorted list; the
+    sequence is when the book joined the library (or the category), so ties
+    keep that order like the stable sort they replace. Custom order always
+    breaks ties by library order, so renumbering it (see
+    Library.renumber_custom_order) keeps every view's order. A changed book is moved with bisect
+    instead of re-sorting.
+    """
+
+    __slots__ = ('entries',)
+
+    def __init__(self, entries):
+        self.entries = sorted(entries)
+
+    def insert(self, entry):
+        bisect.insort(self.entries, entry)
+
+    def remove(self, entry):
+        index = bisect.bisect_left(self.entries, entry)
+        if index < len(self.entries) and self.entries[index] == entry:
+            del self.entries[index]
+
+
+class LibrarySnapshot:
+    """Immutable view of the library at one version.
+
+    Holds a tuple of read-only book records in insertion order; it never
+    changes after creation, so background threads can iterate it while the
+    Tk thread keeps editing the library.
+    """
+
+    __slots__ = ('version', 'books', 'by_id')
+
+    def __init__(self, version, books):
+        self.version = version
+        self.books = books
+        self.by_id = MappingProxyType({book['id']: book for book in books})
+
+    def __len__(self):
+        return len(self.books)
+
+    def __iter__(self):
+        return iter(self.books)
+
+    def __contains__(self, book_id):
+        return book_id in self.by_id
+
+    def get(self, book_id):
+        return self.by_id.get(book_id)
+
+    def to_dicts(self):
+        """Plain book dicts for JSON export"""
+        return [book.to_dict() for book in self.books]
+
+
+class Library:
+    """In-memory book collection with hash indexes.
+
+    Books are kept as Book records (plain dicts are converted on add) in
+    insertion order in a dict keyed by id, alongside an index by normalized
+    path, a per-category membership index and a trigram search index.
+    Every add/remove/update goes through this class so the indexes never
+    drift.
+
+    Sorted orders for the shelf's sort modes are OrderedViews per
+    (category, mode), built the first time they are asked for and then
+    updated in place as single books change. query() caches the visible
+    list for (search, category, sort mode, version), where version is the
+    generation counter bumped by every change.
+
+    The Tk thread works on the live records; other threads use snapshot(),
+    an immutable LibrarySnapshot. It is rebuilt lazily: the first call
+    after a change takes the lock and builds a new O(n) tuple on the
+    calling thread, copying only the records changed since the last
+    snapshot. Until the next change, further calls return that snapshot
+    with a plain attribute read and no lock.
+    """
+
+    def __init__(self, books=()):
+        self.lock = threading.Lock()  # Held by mutations and while building a snapshot
+        self.version = 0
+        self.frozen = {}  # book_id -> read-only record as of the last snapshot
+        self.current_snapshot = None
+        self.sequence = itertools.count()
+        self.query_cache = OrderedDict()  # (query, category, mode, version) -> books
+        self.load(books)
+
+    def load(self, books):
+        """Replace the whole collection (startup, profile import)"""
+        with self.lock:
+            self.by_id = {}
+            self.by_path = {}
+            self.by_category = {}  # category -> {book_id: sequence when it joined}
+            self.search_index = TrigramIndex()
+            self.frozen = {}
+            self.positions = {}  # book_id -> insertion sequence (tie-break in ordered views)
+            self.views = {}      # (category or None, sort mode) -> OrderedView
+            self.version += 1
+        for book in books:
+            self.add(book)
+
+    def snapshot(self):
+        """Immutable LibrarySnapshot of the current contents (safe from any thread;
+        rebuilt under the lock if the library changed since the last call)"""
+        snapshot = self.current_snapshot
+        if snapshot is not None and snapshot.version == self.version:
+            return snapshot
+        with self.lock:
+            frozen = self.frozen
+            books = []
+            for book_id, book in self.by_id.items():
+                record = frozen.get(book_id)
+                if record is None:
+                    record = frozen[book_id] = book.frozen_copy()
+                books.append(record)
+            self.current_snapshot = LibrarySnapshot(self.version, tuple(books))
+            return self.current_snapshot
+
+    def changed(self, book_id):
+        """Invalidate one book's frozen record (caller holds the lock)"""
+        self.frozen.pop(book_id, None)
+        self.version += 1
+
+    def __len__(self):
+        return len(self.by_id)
+
+    def __iter__(self):
+        return iter(list(self.by_id.values()))
+
+    def __contains__(self, book_id):
+        return book_id in self.by_id
+
+    def get(self, book_id):
+        return self.by_id.get(book_id)
+
+    def find_by_path(self, path):
+        return self.by_path.get(normalize_path(path))
+
+    def in_category(self, category):
+        """Books in one category, in the order they joined it"""
+        ids = self.by_category.get(category, {})
+        return [self.by_id[book_id] for book_id in ids]
+
+    def search(self, query):
+        """Books matching a search query, best match first"""
+        return [self.by_id[book_id] for book_id in self.search_index.search(query)]
+
+    def category_of(self, book):
+        return book.get('category') or 'Uncategorized'
+
+    # ---- ordered views ------------------------------------------------------
+
+    def ordered(self, mode, category=None):
+        """Books of one category (None: all books) in sort-mode order"""
+        with self.lock:
+            if mode not in SORT_KEYS:
+                ids = self.by_id if category is None else self.by_category.get(category, {})
+                return [self.by_id[book_id] for book_id in ids]
+            by_id = self.by_id
+            return [by_id[entry[2]] for entry in self.view(mode, category).entries]
+
+    def query(self, query, category=None, mode='recent'):
+        """Books to show for a search (ranked; custom order in custom mode) or a category listing"""
+        key = (query, category, mode, self.version)
+        books = self.query_cache.get(key)
+        if books is not None:
+            self.query_cache.move_to_end(key)
+            return list(books)
+
+        if query:
+            books = self.search(query)
+            if category is not None:
+                books = [book for book in books if self.category_of(book) == category]
+            if mode == 'custom':
+                # Ties in library order, as in every custom view
+                books.sort(key=lambda book: (custom_key(book), self.positions[book['id']]))
+        else:
+            books = self.ordered(mode, category)
+
+        if any(cached[3] != self.version for cached in self.query_cache):
+            self.query_cache.clear()  # Older generation
+        self.query_cache[key] = books
+        while len(self.query_cache) > QUERY_CACHE_SIZE:
+            self.query_cache.popitem(last=False)
+        return list(books)
+
+    def view(self, mode, category=None):
+        """OrderedView for a sort mode, sorted once on first use (caller holds the lock)"""
+        view = self.views.get((category, mode))
+        if view is None:
+            ids = self.by_id if category is None else self.by_category.get(category, {})
+            view = OrderedView(self.order_entry(self.by_id[book_id], mode, category) for book_id in ids)
+            self.views[(category, mode)] = view
+        return view
+
+    def order_entry(self, book, mode, category):
+        book_id = book['id']
+        if category is None or mode == 'custom':
+            sequence = self.positions[book_id]
+        else:
+            sequence = self.by_category[category][book_id]
+        return (SORT_KEYS[mode](book), sequence, book_id)
+
+    # ---- custom order -------------------------------------------------------
+
+    def next_custom_order(self):
+        """custom_order that puts a new book after every other"""
+        with self.lock:
+            entries = self.view('custom').entries
+            return math.floor(entries[-1][0]) + 1 if entries else 0
+
+    def move_in_custom_order(self, book_id, before_id, after_id):
+        """Give a book a custom_order between two others (None: an end of the list).
+
+        Keys are fractional, so normally only the moved book changes. When
+        the neighbours' keys are equal or too close to split, the library
+        is renumbered first (keeping its order). Returns (moved, changes):
+        changes maps every book whose key changed to {'custom_order': key}
+        and must be saved even when moved is False (the neighbours were
+        not adjacent in custom order, so no key fits between them).
+        """
+        def neighbour_keys():
+            return (custom_key(self.by_id[before_id]) if before_id else None,
+                    custom_key(self.by_id[after_id]) if after_id else None)
+
+        changes = {}
+        before, after = neighbour_keys()
+        order = custom_order_between(before, after)
+        if order is None and before <= after:
+            changes = self.renumber_custom_order()
+            order = custom_order_between(*neighbour_keys())
+        if order is None:
+            print(f"Cannot place book {book_id} between {before_id} and {after_id}: not adjacent in custom order")
+            return False, changes
+        self.update(book_id, custom_order=order)
+        changes[book_id] = {'custom_order': order}
+        return True, changes
+
+    def renumber_custom_order(self):
+        """Reassign custom_order 0, 1, 2, ... in the current custom order (rare rebalance)"""
+        with self.lock:
+            changes = {}
+            for position, entry in enumerate(self.view('custom').entries):
+                book_id = entry[2]
+                book = self.by_id[book_id]
+                if book.get('custom_order') != position:
+                    book['custom_order'] = position
+                    changes[book_id] = {'custom_order': position}
+                    self.changed(book_id)
+            # Only the keys in the custom views are stale; rebuild them on next use
+            for view_key in [view_key for view_key in self.views if view_key[1] == 'custom']:
+                del self.views[view_key]
+        return changes
+
+    def place_in_views(self, book, insert):
+        """Insert a book into, or remove it from, the views it belongs to (caller holds the lock)"""
+        category = self.category_of(book)
+        for (view_category, mode), view in self.views.items():
+            if view_category is None or view_category == category:
+                entry = self.order_entry(book, mode, view_category)
+                if insert:
+                    view.insert(entry)
+                else:
+                    view.remove(entry)
+
+    # ---- mutations ----------------------------------------------------------
+
+    def add(self, book):
+        """Add a book (a Book or a plain dict); returns the stored Book"""
+        book = Book.from_dict(book)
+        book.setdefault('category', 'Uncategorized')
+        with self.lock:
+            if book['id'] in self.by_id:
+                self.place_in_views(self.by_id[book['id']], insert=False)  # Replaced record
+            else:
+                self.positions[book['id']] = next(self.sequence)
+            self.by_id[book['id']] = book
+            self.by_path[normalize_path(book['path'])] = book
+            self.by_category.setdefault(self.category_of(book), {})[book['id']] = next(self.sequence)
+            self.place_in_views(book, insert=True)
+            self.changed(book['id'])
+        self.search_index.add(book)
+        return book
+
+    def remove(self, book_id):
+        with self.lock:
+            book = self.by_id.pop(book_id, None)
+            if book is None:
+                return None
+            self.place_in_views(book, insert=False)
+            del self.positions[book_id]
+            path_key = normalize_path(book['path'])
+            if self.by_path.get(path_key) is book:
+                del self.by_path[path_key]
+            self.by_category.get(self.category_of(book), {}).pop(book_id, None)
+            self.changed(book_id)
+        self.search_index.remove(book_id)
+        return book
+
+    def update(self, book_id, **changes):
+        """Apply field changes to one book, keeping the indexes consistent"""
+        with self.lock:
+            book = self.by_id.get(book_id)
+            if book is None:
+                return None
+            reorder = not ORDER_FIELDS.isdisjoint(changes)
+            if reorder:
+                self.place_in_views(book, insert=False)
+
+            if 'path' in changes and changes['path'] != book['path']:
+                path_key = normalize_path(book['path'])
+                if self.by_path.get(path_key) is book:
+                    del self.by_path[path_key]
+                self.by_path[normalize_path(changes['path'])] = book
+
+            if 'category' in changes and changes['category'] != self.category_of(book):
+                self.by_category.get(self.category_of(book), {}).pop(book_id, None)
+                self.by_category.setdefault(changes['category'] or 'Uncategorized', {})[book_id] = next(self.sequence)
+
+            book.update(changes)
+            if reorder:
+                self.place_in_views(book, insert=True)
+            self.changed(book_id)
+        if any(field in changes for field in TrigramIndex.FIELDS):
+            self.search_index.update(book)
+        return book
@@ -0,0 +1,442 @@
+import sqlite3
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # Windows
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+
+# Columns stored natively on the books table; any other keys found on a book
+# record are kept in the 'extra' JSON column so round-trips stay lossless.
+BOOK_COLUMNS = (
+    'id', 'title', 'path', 'filename', 'pages', 'added_date', 'last_opened',
+    'last_page', 'thumbnail_page', 'reading_direction', 'category', 'custom_order'
+)
+
+FAVORITE_KEYS = ('id', 'page', 'name', 'created_date')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS books (
+    id TEXT PRIMARY KEY,
+    title TEXT,
+    path TEXT,
+    path_norm TEXT,
+    filename TEXT,
+    pages INTEGER DEFAULT 0,
+    added_date TEXT,
+    last_opened TEXT,
+    last_page INTEGER DEFAULT 0,
+    thumbnail_page INTEGER DEFAULT 0,
+    reading_direction TEXT DEFAULT 'left_to_right',
+    category TEXT DEFAULT 'Uncategorized',
+    custom_order NUMERIC,
+    extra TEXT
+);
+CREATE INDEX IF NOT EXISTS books_path_norm ON books(path_norm);
+CREATE INDEX IF NOT EXISTS books_category ON books(category);
+CREATE TABLE IF NOT EXISTS favorites (
+    book_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    fav_id TEXT,
+    page INTEGER,
+    name TEXT,
+    created_date TEXT,
+    PRIMARY KEY (book_id, position)
+);
+CREATE TABLE IF NOT EXISTS categories (
+    name TEXT PRIMARY KEY
+);
+"""
+
+
+def normalize_path(path):
+    """Normalize a PDF path the same way the reader and shelf compare them"""
+    return os.path.normpath(path) if path else ''
+
+
+@contextmanager
+def file_lock(lock_path):
+    """Exclusive advisory lock on a side file, shared by the shelf and reader processes"""
+    with open(lock_path, 'a+b') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        elif msvcrt is not None:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            elif msvcrt is not None:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class LibraryStore:
+    """SQLite (WAL mode) storage for books, favorite pages and categories.
+
+    Every mutation is a per-row statement, so saving a bookmark is a single
+    indexed UPDATE instead of rewriting the whole library file.
+    """
+
+    def __init__(self, db_path, json_path=None):
+        self.db_path = db_path
+        self.json_path = json_path
+        self.lock = threading.RLock()
+
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        # Autocommit mode; multi-statement changes go through transaction()
+        self.conn = sqlite3.connect(db_path, timeout=10, isolation_level=None,
+                                    check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+        self.migrate_from_json()
+
+    @contextmanager
+    def transaction(self):
+        """Run a block of statements as one write transaction"""
+        with self.lock:
+            if self.conn.in_transaction:
+                # Nested call - the outer transaction commits
+                yield self.conn
+                return
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.conn
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            else:
+                self.conn.execute("COMMIT")
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    # ---- migration / export -------------------------------------------------
+
+    def migrate_from_json(self):
+        """One-time import of the legacy bookshelf.json into the database"""
+        if not self.json_path or not os.path.exists(self.json_path):
+            return False
+
+        with self.transaction() as conn:
+            # Re-check inside the transaction in case the reader and the shelf
+            # start at the same time
+            row = conn.execute("SELECT value FROM meta WHERE key = 'json_migrated'").fetchone()
+            if row is not None:
+                return False
+
+            try:
+                with open(self.json_path, 'r', encoding='utf-8') as f:
+                    books = json.load(f)
+            except Exception as e:
+                print(f"Error reading {self.json_path} for migration: {e}")
+                books = []
+
+            for book in books:
+                self._insert_book(conn, book)
+            conn.executemany(
+                "INSERT OR IGNORE INTO categories(name) VALUES (?)",
+                [(book.get('category') or 'Uncategorized',) for book in books]
+            )
+            conn.execute("INSERT OR REPLACE INTO meta(key, value) VALUES ('json_migrated', ?)",
+                         (str(len(books)),))
+
+        print(f"Migrated {len(books)} books from {os.path.basename(self.json_path)}")
+        return True
+
+    def export_json(self, file_path=None):
+        """Write the whole library in the legacy bookshelf.json format (atomically)"""
+        file_path = file_path or self.json_path
+        if not file_path:
+            return
+        books = self.load_books()
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        temp_path = f"{file_path}.{os.getpid()}.tmp"
+        with file_lock(file_path + ".lock"):
+            try:
+                with open(temp_path, 'w', encoding='utf-8') as f:
+                    json.dump(books, f, indent=2, ensure_ascii=False)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(temp_path, file_path)
+            finally:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+
+    # ---- row conversion -----------------------------------------------------
+
+    def _book_params(self, book):
+        extra = {k: v for k, v in book.items()
+                 if k not in BOOK_COLUMNS and k != 'favorite_pages'}
+        return (
+            book['id'], book.get('title'), book.get('path'), normalize_path(book.get('path')),
+            book.get('filename'), book.get('pages', 0), book.get('added_date'),
+            book.get('last_opened'), book.get('last_page', 0), book.get('thumbnail_page', 0),
+            book.get('reading_direction', 'left_to_right'),
+            book.get('category', 'Uncategorized'), book.get('custom_order'),
+            json.dumps(extra, ensure_ascii=False) if extra else None
+        )
+
+    def _insert_book(self, conn, book):
+        conn.execute(
+            "INSERT OR REPLACE INTO books(id, title, path, path_norm, filename, pages, added_date, "
+            "last_opened, last_page, thumbnail_page, reading_direction, category, custom_order, extra) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            self._book_params(book)
+        )
+        self._write_favorites(conn, book['id'], book.get('favorite_pages', []))
+
+    def _write_favorites(self, conn, book_id, favorites):
+        conn.execute("DELETE FROM favorites WHERE book_id = ?", (book_id,))
+        conn.executemany(
+            "INSERT INTO favorites(book_id, position, fav_id, page, name, created_date) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [(book_id, i, fav.get('id'), fav.get('page'), fav.get('name'), fav.get('created_date'))
+             for i, fav in enumerate(favorites)]
+        )
+
+    @staticmethod
+    def _favorite_from_row(row):
+        favorite = {}
+        if row['fav_id'] is not None:
+            favorite['id'] = row['fav_id']
+        favorite['page'] = row['page']
+        favorite['name'] = row['name']
+        if row['created_date'] is not None:
+            favorite['created_date'] = row['created_date']
+        return favorite
+
+    @staticmethod
+    def _book_from_row(row, favorites):
+        book = {key: row[key] for key in BOOK_COLUMNS}
+        if book['custom_order'] is None:
+            del book['custom_order']
+        if row['extra']:
+            book.update(json.loads(row['extra']))
+        book['favorite_pages'] = favorites
+        return book
+
+    # ---- queries ------------------------------------------------------------
+
+    def load_books(self):
+        """Load every book (with favorites) in insertion order"""
+        with self.lock:
+            favorites = {}
+            for row in self.conn.execute("SELECT * FROM favorites ORDER BY book_id, position"):
+                favorites.setdefault(row['book_id'], []).append(self._favorite_from_row(row))
+            rows = self.conn.execute("SELECT * FROM books ORDER BY rowid").fetchall()
+        return [self._book_from_row(row, favorites.get(row['id'], [])) for row in rows]
+
+    def load_categories(self):
+        with self.lock:
+            return {row['name'] for row in self.conn.execute("SELECT name FROM categories")}
+
+    def get_favorites(self, book_id):
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT * FROM favorites WHERE book_id = ? ORDER BY position", (book_id,)
+            ).fetchall()
+        return [self._favorite_from_row(row) for row in rows]
+
+    def get_book(self, book_id):
+        with self.lock:
+            row = self.conn.execute("SELECT * FROM books WHERE id = ?", (book_id,)).fetchone()
+        if row is None:
+            return None
+        return self._book_from_row(row, self.get_favorites(book_id))
+
+    def find_book_by_path(self, path):
+        """Look up a book by its (normalized) file path using the path index"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT * FROM books WHERE path_norm = ? LIMIT 1", (normalize_path(path),)
+            ).fetchone()
+        if row is None:
+            return None
+        return self._book_from_row(row, self.get_favorites(row['id']))
+
+    # ---- mutations ----------------------------------------------------------
+
+    def add_books(self, books):
+        with self.transaction() as conn:
+            for book in books:
+                self._insert_book(conn, book)
+                conn.execute("INSERT OR IGNORE INTO categories(name) VALUES (?)",
+                             (book.get('category', 'Uncategorized'),))
+
+    def update_book(self, book_id, **fields):
+        """Update individual fields of one book"""
+        columns = {k: v for k, v in fields.items() if k in BOOK_COLUMNS and k != 'id'}
+        extra = {k: v for k, v in fields.items()
+                 if k not in BOOK_COLUMNS and k != 'favorite_pages'}
+
+        with self.transaction() as conn:
+            if 'path' in columns:
+                columns['path_norm'] = normalize_path(columns['path'])
+            if columns:
+                assignments = ", ".join(f"{name} = ?" for name in columns)
+                conn.execute(f"UPDATE books SET {assignments} WHERE id = ?",
+                             (*columns.values(), book_id))
+            if extra:
+                row = conn.execute("SELECT extra FROM books WHERE id = ?", (book_id,)).fetchone()
+                merged = json.loads(row['extra']) if row and row['extra'] else {}
+                merged.update(extra)
+                conn.execute("UPDATE books SET extra = ? WHERE id = ?",
+                             (json.dumps(merged, ensure_ascii=False), book_id))
+            if 'favorite_pages' in fields:
+                self._write_favorites(conn, book_id, fields['favorite_pages'])
+            if 'category' in columns:
+                conn.execute("INSERT OR IGNORE INTO categories(name) VALUES (?)",
+                             (columns['category'],))
+
+    def update_books(self, updates):
+        """Apply {book_id: {field: value}} updates in a single transaction"""
+        with self.transaction():
+            for book_id, fields in updates.items():
+                self.update_book(book_id, **fields)
+
+    def update_bookmark(self, path, last_page, last_opened):
+        """Save a reading position; returns False if the book is not in the library"""
+        with self.lock:
+            cursor = self.conn.execute(
+                "UPDATE books SET last_page = ?, last_opened = ? WHERE path_norm = ?",
+                (last_page, last_opened, normalize_path(path))
+            )
+        return cursor.rowcount > 0
+
+    def set_favorites(self, book_id, favorites):
+        with self.transaction() as conn:
+            self._write_favorites(conn, book_id, favorites)
+
+    def remove_book(self, book_id):
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM favorites WHERE book_id = ?", (book_id,))
+            conn.execute("DELETE FROM books WHERE id = ?", (book_id,))
+
+    def add_category(self, name):
+        with self.lock:
+            self.conn.execute("INSERT OR IGNORE INTO categories(name) VALUES (?)", (name,))
+
+    def delete_category(self, name, fallback='Uncategorized'):
+        """Delete a category and move its books to the fallback category"""
+        with self.transaction() as conn:
+            conn.execute("UPDATE books SET category = ? WHERE category = ?", (fallback, name))
+            conn.execute("DELETE FROM categories WHERE name = ?", (name,))
+
+    def replace_all(self, books, categories):
+        """Replace the whole library (used by profile import)"""
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM favorites")
+            conn.execute("DELETE FROM books")
+            conn.execute("DELETE FROM categories")
+            for book in books:
+                self._insert_book(conn, book)
+            conn.executemany("INSERT OR IGNORE INTO categories(name) VALUES (?)",
+                             [(name,) for name in categories if name != 'All'])
+
+
+class WriteBehindQueue:
+    """Coalescing background writer in front of a LibraryStore.
+
+    Field updates, favorite lists and bookmarks are merged per book in
+    memory - a newer value for the same field simply replaces the pending
+    one - and a background thread writes everything pending in a single
+    transaction every `interval` seconds, so the Tk thread never waits on
+    the database. close() stops the thread and writes what is left; a
+    failed write is put back and retried on the next flush.
+    """
+
+    def __init__(self, store, interval=1.0):
+        self.store = store
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()  # One flush at a time
+        self.updates = {}    # book_id -> {field: value}
+        self.favorites = {}  # book_id -> favorite list
+        self.bookmarks = {}  # normalized path -> (path, last_page, last_opened)
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def update_book(self, book_id, **fields):
+        with self.lock:
+            self.updates.setdefault(book_id, {}).update(fields)
+            if 'favorite_pages' in fields:
+                self.favorites.pop(book_id, None)
+
+    def update_books(self, updates):
+        """Queue {book_id: {field: value}} updates"""
+        for book_id, fields in updates.items():
+            self.update_book(book_id, **fields)
+
+    def set_favorites(self, book_id, favorites):
+        with self.lock:
+            # Copied: the caller keeps editing its list
+            self.favorites[book_id] = [dict(favorite) for favorite in favorites]
+
+    def update_bookmark(self, path, last_page, last_opened):
+        with self.lock:
+            self.bookmarks[normalize_path(path)] = (path, last_page, last_opened)
+
+    def discard(self, book_id):
+        """Drop pending changes for a book that is being removed"""
+        with self.lock:
+            self.updates.pop(book_id, None)
+            self.favorites.pop(book_id, None)
+
+    def flush(self):
+        """Write everything pending now (from any thread)"""
+        with self.flush_lock:
+            with self.lock:
+                updates, self.updates = self.updates, {}
+                favorites, self.favorites = self.favorites, {}
+                bookmarks, self.bookmarks = self.bookmarks, {}
+            if not (updates or favorites or bookmarks):
+                return
+            try:
+                with self.store.transaction():
+                    self.store.update_books(updates)
+                    for book_id, favorite_list in favorites.items():
+                        self.store.set_favorites(book_id, favorite_list)
+                    for path, last_page, last_opened in bookmarks.values():
+                        self.store.update_bookmark(path, last_page, last_opened)
+            except Exception as e:
+                print(f"Error writing library changes (will retry): {e}")
+                self.requeue(updates, favorites, bookmarks)
+
+    def requeue(self, updates, favorites, bookmarks):
+        with self.lock:
+            # Anything queued since the failed flush is newer and wins
+            for book_id, fields in updates.items():
+                self.updates[book_id] = {**fields, **self.updates.get(book_id, {})}
+            for book_id, favorite_list in favorites.items():
+                self.favorites.setdefault(book_id, favorite_list)
+            for path, bookmark in bookmarks.items():
+                self.bookmarks.setdefault(path, bookmark)
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.flush()
+
+    def close(self):
+        self.stopped.set()
+        self.thread.join()
+        self.flush()
@@ -0,0 +1,173 @@
+import os
+import sys
+import threading
+from caching import ByteLRU
+
+if os.name == 'nt':
+    import ctypes
+    from ctypes import wintypes
+
+    class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+        _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD),
+                    ('PeakWorkingSetSize', ctypes.c_size_t), ('WorkingSetSize', ctypes.c_size_t),
+                    ('QuotaPeakPagedPoolUsage', ctypes.c_size_t), ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                    ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t), ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                    ('PagefileUsage', ctypes.c_size_t), ('PeakPagefileUsage', ctypes.c_size_t)]
+
+    class MEMORYSTATUSEX(ctypes.Structure):
+        _fields_ = [('dwLength', wintypes.DWORD), ('dwMemoryLoad', wintypes.DWORD),
+                    ('ullTotalPhys', ctypes.c_ulonglong), ('ullAvailPhys', ctypes.c_ulonglong),
+                    ('ullTotalPageFile', ctypes.c_ulonglong), ('ullAvailPageFile', ctypes.c_ulonglong),
+                    ('ullTotalVirtual', ctypes.c_ulonglong), ('ullAvailVirtual', ctypes.c_ulonglong),
+                    ('ullAvailExtendedVirtual', ctypes.c_ulonglong)]
+
+
+def windows_process_rss():
+    """Working set of this process (GetProcessMemoryInfo)"""
+    kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+    kernel32.GetCurrentProcess.restype = wintypes.HANDLE
+    get_info = kernel32.K32GetProcessMemoryInfo  # psapi's function, exported by kernel32 since Windows 7
+    get_info.argtypes = [wintypes.HANDLE, ctypes.POINTER(PROCESS_MEMORY_COUNTERS), wintypes.DWORD]
+    get_info.restype = wintypes.BOOL
+    counters = PROCESS_MEMORY_COUNTERS()
+    counters.cb = ctypes.sizeof(counters)
+    if not get_info(kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb):
+        return None
+    return counters.WorkingSetSize
+
+
+def windows_available_memory():
+    """Available physical memory (GlobalMemoryStatusEx)"""
+    kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+    status = MEMORYSTATUSEX()
+    status.dwLength = ctypes.sizeof(status)
+    if not kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+        return None
+    return status.ullAvailPhys
+
+
+def process_rss():
+    """Current resident set size of this process in bytes (Linux, Windows), or None if it cannot be read"""
+    # resource.ru_maxrss is not a substitute: it is the peak, so once past the
+    # limit it would keep trimming the cache for the rest of the session
+    if os.name == 'nt':
+        try:
+            return windows_process_rss()
+        except (OSError, AttributeError):
+            return None
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def available_memory():
+    """System memory still available in bytes (Linux, Windows), or None"""
+    if os.name == 'nt':
+        try:
+            return windows_available_memory()
+        except (OSError, AttributeError):
+            return None
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+class PageCache(ByteLRU):
+    """Byte-budgeted cache of rendered pages for the reader.
+
+    Keys are tuples whose first two items are (document token, page);
+    anything after that (size, zoom, tile) is free-form. Eviction drops the
+    pages farthest from the reading position first - pages behind the
+    reader count double, since they are less likely to be needed than the
+    ones ahead - and least recently used among equals. check_memory()
+    trims the cache further when the process or the system runs low.
+    Safe to use from render threads.
+    """
+
+    MIN_AVAILABLE = 256 * 1024 * 1024  # Trim when the system has less than this free
+
+    def __init__(self, budget_bytes, rss_limit=None, protect=None):
+        super().__init__(budget_bytes, protect=protect)
+        self.lock = threading.RLock()
+        self.rss_limit = rss_limit
+        self.focus_doc = None
+        self.focus_page = 0
+        self.direction = 1  # +1 when reading toward higher page numbers
+        self.pressure_trims = 0
+
+    def set_focus(self, doc_token, page, direction=1):
+        """Tell the cache where the reader is and which way it is moving"""
+        with self.lock:
+            self.focus_doc = doc_token
+            self.focus_page = page
+            self.direction = 1 if direction >= 0 else -1
+
+    def distance(self, key):
+        if key[0] != self.focus_doc:
+            return sys.maxsize  # Another document: first to go
+        offset = (key[1] - self.focus_page) * self.direction
+        return offset if offset >= 0 else 1 - 2 * offset
+
+    def get(self, key, default=None):
+        with self.lock:
+            return super().get(key, default)
+
+    def put(self, key, value, size):
+        with self.lock:
+            super().put(key, value, size)
+
+    def discard(self, key):
+        with self.lock:
+            return super().discard(key)
+
+    def clear(self):
+        with self.lock:
+            super().clear()
+
+    def discard_document(self, doc_token):
+        with self.lock:
+            for key in [key for key in self.entries if key[0] == doc_token]:
+                super().discard(key)
+
+    def evict(self, target=None):
+        with self.lock:
+            target = self.budget if target is None else target
+            if self.total <= target:
+                return
+            # Farthest first; the stable sort keeps LRU order among equals
+            for key in sorted(self.entries, key=self.distance, reverse=True):
+                if self.total <= target:
+                    break
+                if self.protect is not None and self.protect(key):
+                    continue
+                value, size = self.entries.pop(key)
+                self.total -= size
+                self.evictions += 1
+                if self.on_evict is not None:
+                    self.on_evict(key, value)
+
+    def check_memory(self):
+        """Halve the cache if the process or the system is short of memory; True if trimmed"""
+        rss = process_rss()
+        available = available_memory()
+        low = ((self.rss_limit and rss is not None and rss > self.rss_limit) or
+               (available is not None and available < self.MIN_AVAILABLE))
+        if not low or not self.entries:
+            return False
+        self.evict(self.total // 2)
+        self.pressure_trims += 1
+        return True
+
+    def stats(self):
+        with self.lock:
+            stats = super().stats()
+        stats['pressure_trims'] = self.pressure_trims
+        stats['rss'] = process_rss()
+        return stats
@@ -0,0 +1,113 @@
+import math
+import time
+
+
+class Prefetcher:
+    """Sizes the reader's prefetch window from how fast pages render and turn.
+
+    Keeps moving averages of the render time per page and of the time
+    between page turns, plus a signed average of the turn direction. The
+    window covers enough spreads ahead that pages are ready before a
+    reader turning at the current pace reaches them. Spreads behind the
+    reader only get a full share while the direction is uncertain.
+
+    Pages are virtual pages as used by FullscreenReader: page 0 is the
+    cover shown alone, then spreads start at 1, 3, 5, ... Directions are
+    in page-number order, which is the same for right_to_left books (only
+    the side each page is drawn on changes).
+    """
+
+    ALPHA = 0.3              # Weight of the newest sample in the averages
+    MIN_SPREADS = 1          # Always have the next spread in flight
+    MAX_SPREADS = 8
+    LEAD = 3.0               # Spreads of render time to keep ahead of the reader
+    MAX_TURN_GAP = 60.0      # Longer pauses are reading, not flipping
+
+    def __init__(self):
+        self.render_time = 0.15   # Seconds per page, refined by record_render
+        self.turn_interval = None
+        self.direction = 1.0      # -1..1, average of recent turn directions
+        self.last_turn = None
+        self.hits = 0
+        self.misses = 0
+
+    # ---- measurements -------------------------------------------------------
+
+    def ema(self, average, sample):
+        return sample if average is None else average + self.ALPHA * (sample - average)
+
+    def record_render(self, seconds):
+        if seconds and seconds > 0:
+            self.render_time = self.ema(self.render_time, seconds)
+
+    def record_turn(self, direction):
+        now = time.monotonic()
+        if self.last_turn is not None:
+            self.turn_interval = self.ema(self.turn_interval, min(now - self.last_turn, self.MAX_TURN_GAP))
+        self.last_turn = now
+        self.direction = self.ema(self.direction, 1.0 if direction >= 0 else -1.0)
+
+    def record_display(self, hit):
+        """Count whether a page shown after a turn was already prefetched"""
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+    @property
+    def hit_rate(self):
+        shown = self.hits + self.misses
+        return self.hits / shown if shown else 0.0
+
+    # ---- planning -----------------------------------------------------------
+
+    @staticmethod
+    def spread_pages(page, total_pages):
+        pages = [0] if page == 0 else [page, page + 1]
+        return [p for p in pages if 0 <= p < total_pages]
+
+    @staticmethod
+    def step(page, direction):
+        """Virtual page of the neighbouring spread (None past the start)"""
+        if direction > 0:
+            return 1 if page == 0 else page + 2
+        if page == 0:
+            return None
+        return 0 if page <= 1 else max(0, page - 2)
+
+    def window(self, workers=1):
+        """(spreads ahead, spreads behind) in the direction of travel"""
+        if self.turn_interval is None:
+            ahead = 2
+        else:
+            spread_time = 2 * self.render_time / max(1, workers)
+            ahead = math.ceil(self.LEAD * spread_time / max(self.turn_interval, 0.05))
+        ahead = max(self.MIN_SPREADS, min(self.MAX_SPREADS, ahead))
+        behind = 1 if abs(self.direction) > 0.8 else max(1, (ahead + 1) // 2)
+        return ahead, behind
+
+    def plan(self, current_page, total_pages, workers=1):
+        """Pages to prefetch as (page, priority), most urgent first"""
+        forward = 1 if self.direction >= 0 else -1
+        ahead, behind = self.window(workers)
+        order = [(p, 0) for p in self.spread_pages(current_page, total_pages)]
+        for direction, count, weight in ((forward, ahead, 1), (-forward, behind, 2)):
+            page = current_page
+            for distance in range(1, count + 1):
+                page = self.step(page, direction)
+                if page is None or page >= total_pages:
+                    break
+                order.extend((p, distance * weight) for p in self.spread_pages(page, total_pages))
+        return order
+
+    def stats(self, workers=1):
+        ahead, behind = self.window(workers)
+        return {
+            'ahead': ahead,
+            'behind': behind,
+            'render_ms': self.render_time * 1000,
+            'turn_s': self.turn_interval,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hit_rate,
+        }
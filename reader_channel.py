@@ -0,0 +1,209 @@
+import socket
+import json
+import os
+import secrets
+import threading
+
+
+# Environment variable through which the shelf tells a reader process where
+# to publish its events: "host:port:token"
+CHANNEL_ENV = 'PDF_BOOKSHELF_CHANNEL'
+
+
+class ShelfChannelServer:
+    """Loopback socket server that receives reader events for the bookshelf.
+
+    Messages are newline-delimited JSON objects, each carrying a 'type' and a
+    'book_id'. A connection must start with a 'hello' message holding the
+    shared token; every book announced on a connection is considered closed
+    when that connection drops. A resident reader process says hello with
+    role 'host'; commands such as 'open' are sent back down its connection
+    (send_command), queued until it has connected if asked to.
+    """
+
+    def __init__(self, on_event, on_disconnect):
+        self.on_event = on_event
+        self.on_disconnect = on_disconnect
+        self.token = secrets.token_hex(16)
+        self.running = True
+        self.host_conn = None  # Connection of the resident reader, if one is running
+        self.host_lock = threading.Lock()
+        self.pending_commands = []
+
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.bind(('127.0.0.1', 0))
+        self.sock.listen()
+        self.port = self.sock.getsockname()[1]
+
+        threading.Thread(target=self.accept_loop, daemon=True).start()
+
+    @property
+    def address(self):
+        return f"127.0.0.1:{self.port}:{self.token}"
+
+    def environment(self):
+        """Environment for a reader subprocess so it can connect back"""
+        env = os.environ.copy()
+        env[CHANNEL_ENV] = self.address
+        return env
+
+    def accept_loop(self):
+        while self.running:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                break
+            threading.Thread(target=self.connection_loop, args=(conn,), daemon=True).start()
+
+    def connection_loop(self, conn):
+        book_ids = set()
+        authenticated = False
+        try:
+            with conn, conn.makefile('r', encoding='utf-8') as stream:
+                for line in stream:
+                    try:
+                        message = json.loads(line)
+                    except ValueError:
+                        continue
+
+                    if not authenticated:
+                        if message.get('type') != 'hello' or message.get('token') != self.token:
+                            return
+                        authenticated = True
+                        if message.get('role') == 'host':
+                            self.attach_host(conn)
+
+                    book_id = message.get('book_id')
+                    if book_id is None:
+                        continue
+                    if message['type'] == 'closed':
+                        book_ids.discard(book_id)
+                        self.on_disconnect(book_id)
+                        continue
+                    book_ids.add(book_id)
+                    self.on_event(message)
+        except OSError:
+            pass
+        finally:
+            # Reader went away (closed normally or crashed)
+            with self.host_lock:
+                if self.host_conn is conn:
+                    self.host_conn = None
+            for book_id in book_ids:
+                self.on_disconnect(book_id)
+
+    def attach_host(self, conn):
+        with self.host_lock:
+            self.host_conn = conn
+            pending, self.pending_commands = self.pending_commands, []
+        for message in pending:
+            self.send_command(message)
+
+    def send_command(self, message, queue=False):
+        """Send a command to the resident reader; False if none is connected (unless queued)"""
+        data = (json.dumps(message, ensure_ascii=False) + "\n").encode('utf-8')
+        with self.host_lock:
+            if self.host_conn is None:
+                if queue:
+                    self.pending_commands.append(message)
+                return queue
+            try:
+                self.host_conn.sendall(data)
+                return True
+            except OSError:
+                self.host_conn = None
+                return False
+
+    def close(self):
+        self.running = False
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+        with self.host_lock:
+            if self.host_conn is not None:
+                try:
+                    # Lets the resident reader exit once its windows are closed
+                    self.host_conn.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+
+class ReaderChannelClient:
+    """Reader side of the channel: publishes position and favorite events.
+
+    A resident reader also registers as the host and listens for commands.
+    """
+
+    def __init__(self, host, port, token):
+        self.token = token
+        self.sock = socket.create_connection((host, port), timeout=2)
+        self.lock = threading.Lock()
+        self.greeted = set()
+
+    @classmethod
+    def from_environment(cls):
+        """Connect to the shelf named in the environment, or return None"""
+        address = os.environ.get(CHANNEL_ENV)
+        if not address:
+            return None
+        try:
+            host, port, token = address.rsplit(':', 2)
+            return cls(host, int(port), token)
+        except (ValueError, OSError) as e:
+            print(f"Could not connect to bookshelf channel: {e}")
+            return None
+
+    def send(self, message):
+        """Send one message; returns False once the shelf has gone away"""
+        if self.sock is None:
+            return False
+        data = (json.dumps(message, ensure_ascii=False) + "\n").encode('utf-8')
+        try:
+            with self.lock:
+                self.sock.sendall(data)
+            return True
+        except OSError:
+            self.close()
+            return False
+
+    def subscribe(self, book_id):
+        """Announce that this reader has the given book open"""
+        if book_id not in self.greeted:
+            self.greeted.add(book_id)
+            self.send({'type': 'hello', 'token': self.token, 'book_id': book_id})
+
+    def publish(self, event_type, book_id, **payload):
+        self.subscribe(book_id)
+        sent = self.send({'type': event_type, 'book_id': book_id, **payload})
+        if event_type == 'closed':
+            self.greeted.discard(book_id)  # Reopening the book (resident reader) says hello again
+        return sent
+
+    def register_host(self, on_command, on_lost):
+        """Announce a resident reader and deliver the shelf's commands to on_command
+        (on a background thread); on_lost() runs when the shelf goes away"""
+        self.sock.settimeout(None)
+        threading.Thread(target=self.listen_loop, args=(on_command, on_lost), daemon=True).start()
+        self.send({'type': 'hello', 'token': self.token, 'role': 'host'})
+
+    def listen_loop(self, on_command, on_lost):
+        try:
+            with self.sock.makefile('r', encoding='utf-8') as stream:
+                for line in stream:
+                    try:
+                        on_command(json.loads(line))
+                    except ValueError:
+                        continue
+        except (OSError, AttributeError):
+            pass
+        finally:
+            on_lost()
+
+    def close(self):
+        if self.sock is not None:
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+            self.sock = None
@@ -0,0 +1,315 @@
+import math
+import time
+import heapq
+import itertools
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import fitz  # PyMuPDF
+
+
+def render_pixmap(doc, page_num, canvas_width, canvas_height, display_scale):
+    """Rasterize a page so it fits the canvas at the given zoom"""
+    page = doc[page_num]
+    # Fit the page rect into the canvas instead of rendering big and resampling
+    rect = page.rect
+    zoom = min(canvas_width * display_scale / rect.width,
+               canvas_height * display_scale / rect.height)
+    return page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+
+
+def render_tile_pixmap(doc, page_num, zoom, tile_x, tile_y, tile_size):
+    """Rasterize one tile_size square of a page at the given zoom (only that clip region)"""
+    page = doc[page_num]
+    rect = page.rect
+    span = tile_size / zoom  # Tile edge in PDF points
+    x0 = rect.x0 + tile_x * span
+    y0 = rect.y0 + tile_y * span
+    clip = fitz.Rect(x0, y0, min(x0 + span, rect.x1), min(y0 + span, rect.y1))
+    return page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), clip=clip, alpha=False)
+
+
+def render_job(doc, job):
+    """Pixmap for a render job: ('page', page, canvas w, canvas h, zoom) or
+    ('tile', page, zoom, tile x, tile y, tile size)"""
+    if job[0] == 'tile':
+        return render_tile_pixmap(doc, *job[1:])
+    return render_pixmap(doc, *job[1:])
+
+
+class RenderService:
+    """Single background renderer for one PDF.
+
+    The worker thread opens its own fitz.Document, so rendering never
+    touches the handle the UI uses. Requests are served lowest priority
+    number first (the reader passes the distance from the current spread),
+    duplicate requests for a key are merged, and reset() drops everything
+    still queued, so pages requested before fast navigation are never
+    rendered. Results are posted to the Tk thread as
+    callback(key, ppm_bytes_or_None, render_seconds).
+    """
+
+    def __init__(self, root, pdf_path):
+        self.root = root
+        self.pdf_path = pdf_path
+        self.heap = []      # (priority, sequence, key)
+        self.pending = {}   # key -> (sequence, priority, job, callback)
+        self.condition = threading.Condition()
+        self.sequence = itertools.count()
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def request(self, key, job, priority, callback):
+        """Queue a render job (see render_job); a repeated key only raises its priority"""
+        with self.condition:
+            queued = self.pending.get(key)
+            if queued is not None and queued[1] <= priority:
+                return
+            sequence = next(self.sequence)
+            self.pending[key] = (sequence, priority, job, callback)
+            heapq.heappush(self.heap, (priority, sequence, key))
+            self.condition.notify()
+
+    def reset(self):
+        """Forget all queued requests (the reader moved on)"""
+        with self.condition:
+            self.heap = []
+            self.pending = {}
+
+    def is_pending(self, key):
+        with self.condition:
+            return key in self.pending
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.heap = []
+            self.pending = {}
+            self.condition.notify()
+
+    def next_request(self):
+        with self.condition:
+            while self.running:
+                while self.heap:
+                    _, sequence, key = heapq.heappop(self.heap)
+                    queued = self.pending.get(key)
+                    if queued is None or queued[0] != sequence:
+                        continue  # Superseded by a higher-priority request
+                    del self.pending[key]
+                    return key, queued[2], queued[3]
+                self.condition.wait()
+            return None
+
+    def run(self):
+        try:
+            doc = fitz.open(self.pdf_path)
+        except Exception as e:
+            print(f"Render service could not open {self.pdf_path}: {e}")
+            return
+        try:
+            while True:
+                request = self.next_request()
+                if request is None:
+                    break
+                key, job, callback = request
+                started = time.perf_counter()
+                try:
+                    ppm_data = render_job(doc, job).tobytes("ppm")
+                except Exception as e:
+                    print(f"Error rendering page {job[1]}: {e}")
+                    ppm_data = None
+                if self.running:
+                    self.root.after(0, callback, key, ppm_data, time.perf_counter() - started)
+        finally:
+            doc.close()
+
+
+worker_documents = OrderedDict()  # PDFs opened by a render pool process, most recent last
+WORKER_DOCUMENTS = 4
+
+
+def open_worker_document(pdf_path):
+    """The pool process's handle for a PDF, opened on first use and kept for the next jobs"""
+    doc = worker_documents.pop(pdf_path, None)
+    if doc is None:
+        doc = fitz.open(pdf_path)
+        while len(worker_documents) >= WORKER_DOCUMENTS:
+            worker_documents.popitem(last=False)[1].close()
+    worker_documents[pdf_path] = doc
+    return doc
+
+
+def job_buffer_size(job):
+    """Upper bound of a render job's RGB bytes (pixmap sizes round up by at most a pixel)"""
+    if job[0] == 'tile':
+        tile_size = job[5]
+        return (tile_size + 2) * (tile_size + 2) * 3
+    _, _, canvas_width, canvas_height, display_scale = job
+    return (math.ceil(canvas_width * display_scale) + 2) * (math.ceil(canvas_height * display_scale) + 2) * 3
+
+
+def render_to_shared_memory(pdf_path, job, block_name):
+    """Render in a pool process into the reader's shared memory block; returns (width, height, seconds)"""
+    started = time.perf_counter()
+    pix = render_job(open_worker_document(pdf_path), job)
+    samples = pix.samples_mv if hasattr(pix, 'samples_mv') else pix.samples
+    row = pix.width * 3
+    # Attaching registers the name with the resource tracker the pool shares
+    # with the reader again (a no-op); the reader's unlink unregisters it
+    block = shared_memory.SharedMemory(name=block_name)
+    try:
+        if row * pix.height > block.size:
+            raise ValueError(f"{pix.width}x{pix.height} pixmap does not fit the {block.size} byte block")
+        if pix.stride == row:
+            block.buf[:len(samples)] = samples
+        else:
+            for y in range(pix.height):
+                block.buf[y * row:(y + 1) * row] = samples[y * pix.stride:y * pix.stride + row]
+    finally:
+        block.close()
+    return pix.width, pix.height, time.perf_counter() - started
+
+
+def take_shared_pixels(block, width, height):
+    """Copy pool-rendered pixels out of the reader's shared memory block as PPM bytes"""
+    header = f"P6\n{width} {height}\n255\n".encode('ascii')
+    return header + bytes(block.buf[:width * height * 3])
+
+
+def release_block(block):
+    block.close()
+    block.unlink()
+
+
+class RenderPool:
+    """Process-pool alternative to RenderService for multi-core machines.
+
+    Worker processes open each PDF once and keep a few recent ones open;
+    pixels come back through multiprocessing.shared_memory blocks instead
+    of being pickled. The reader creates each block (sized from the job)
+    and keeps its handle until it has copied the pixels out, since Windows
+    deletes a mapping as soon as its last handle closes. Documents use the pool through client(pdf_path),
+    which has RenderService's interface, so several open books can share
+    one pool. The queue works like RenderService's (priority by distance,
+    merged duplicates, reset() on navigation, per client), and only as
+    many jobs as there are workers are submitted at a time so priorities
+    stay effective.
+    """
+
+    def __init__(self, root, workers):
+        self.root = root
+        self.workers = workers
+        self.executor = ProcessPoolExecutor(max_workers=workers)
+        self.heap = []       # (priority, sequence, (client, key))
+        self.pending = {}    # (client, key) -> (sequence, priority, job, callback)
+        self.in_flight = 0
+        self.lock = threading.Lock()
+        self.sequence = itertools.count()
+        self.running = True
+
+    def client(self, pdf_path, owns_pool=False):
+        """RenderService-like handle for one document (owns_pool: its stop() shuts the pool down)"""
+        return RenderPoolClient(self, pdf_path, owns_pool)
+
+    def request(self, client, key, job, priority, callback):
+        with self.lock:
+            entry = (client, key)
+            queued = self.pending.get(entry)
+            if queued is not None and queued[1] <= priority:
+                return
+            sequence = next(self.sequence)
+            self.pending[entry] = (sequence, priority, job, callback)
+            heapq.heappush(self.heap, (priority, sequence, entry))
+        self.dispatch()
+
+    def reset(self, client):
+        """Forget the client's queued requests"""
+        with self.lock:
+            for entry in [entry for entry in self.pending if entry[0] is client]:
+                del self.pending[entry]
+            # Stale heap items are skipped by dispatch()
+
+    def is_pending(self, client, key):
+        with self.lock:
+            return (client, key) in self.pending
+
+    def shutdown(self):
+        with self.lock:
+            self.running = False
+            self.heap = []
+            self.pending = {}
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def dispatch(self):
+        with self.lock:
+            while self.running and self.heap and self.in_flight < self.workers:
+                _, sequence, entry = heapq.heappop(self.heap)
+                queued = self.pending.get(entry)
+                if queued is None or queued[0] != sequence:
+                    continue  # Superseded by a higher-priority request, or reset
+                del self.pending[entry]
+                client, key = entry
+                job, callback = queued[2], queued[3]
+                try:
+                    block = shared_memory.SharedMemory(create=True, size=job_buffer_size(job))
+                except OSError as e:
+                    print(f"Error rendering page {job[1]}: {e}")
+                    if client.running:
+                        self.root.after(0, callback, key, None, None)
+                    continue
+                future = self.executor.submit(render_to_shared_memory, client.pdf_path, job, block.name)
+                self.in_flight += 1
+                future.add_done_callback(
+                    lambda f, c=client, k=key, j=job, cb=callback, b=block: self.on_done(f, c, k, j, cb, b))
+
+    def on_done(self, future, client, key, job, callback, block):
+        with self.lock:
+            self.in_flight -= 1
+        ppm_data = None
+        seconds = None
+        try:
+            if not future.cancelled():
+                width, height, seconds = future.result()
+                ppm_data = take_shared_pixels(block, width, height)
+        except Exception as e:
+            print(f"Error rendering page {job[1]}: {e}")
+        finally:
+            release_block(block)
+        if self.running:
+            if client.running:
+                self.root.after(0, callback, key, ppm_data, seconds)
+            self.dispatch()
+
+
+class RenderPoolClient:
+    """One document's handle on a shared RenderPool (same interface as RenderService)"""
+
+    def __init__(self, pool, pdf_path, owns_pool=False):
+        self.pool = pool
+        self.pdf_path = pdf_path
+        self.owns_pool = owns_pool
+        self.running = True
+
+    @property
+    def workers(self):
+        return self.pool.workers
+
+    def request(self, key, job, priority, callback):
+        """Queue a render job (see render_job); a repeated key only raises its priority"""
+        if self.running:
+            self.pool.request(self, key, job, priority, callback)
+
+    def reset(self):
+        """Forget all queued requests (the reader moved on)"""
+        self.pool.reset(self)
+
+    def is_pending(self, key):
+        return self.pool.is_pending(self, key)
+
+    def stop(self):
+        self.running = False
+        self.pool.reset(self)
+        if self.owns_pool:
+            self.pool.shutdown()
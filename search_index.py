@@ -0,0 +1,127 @@
+import unicodedata
+
+
+def normalize_text(text):
+    """Case- and width-insensitive form used for indexing and queries"""
+    return unicodedata.normalize('NFKC', text or '').casefold()
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def index_grams(text):
+    """Trigrams plus bigrams, so two-character (e.g. Japanese) queries are indexed too"""
+    return trigrams(text) | {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+def query_grams(query):
+    return trigrams(query) if len(query) >= 3 else {query} if len(query) == 2 else set()
+
+
+class TrigramIndex:
+    """Inverted trigram index over book title, filename and category.
+
+    Maintained incrementally as books are added, edited or removed. A query
+    intersects the posting lists of its trigrams (smallest first), verifies
+    the surviving candidates with a substring check and ranks them by where
+    the match occurred. Bigrams are indexed as well so two-character
+    queries (common for Japanese titles) stay indexed; single characters
+    fall back to a substring scan. When the user keeps typing, the new
+    query is answered from the previous result set.
+    """
+
+    FIELDS = ('title', 'filename', 'category')
+
+    def __init__(self):
+        self.postings = {}   # trigram -> set of book ids
+        self.documents = {}  # book id -> (title, filename, category), normalized
+        self.last_query = None
+        self.last_matches = None
+
+    def __len__(self):
+        return len(self.documents)
+
+    def add(self, book):
+        book_id = book['id']
+        if book_id in self.documents:
+            self.remove(book_id)
+        fields = tuple(normalize_text(book.get(field)) for field in self.FIELDS)
+        self.documents[book_id] = fields
+        self.last_query = None
+        for gram in index_grams("\0".join(fields)):
+            self.postings.setdefault(gram, set()).add(book_id)
+
+    def remove(self, book_id):
+        fields = self.documents.pop(book_id, None)
+        if fields is None:
+            return
+        self.last_query = None
+        for gram in index_grams("\0".join(fields)):
+            ids = self.postings.get(gram)
+            if ids is not None:
+                ids.discard(book_id)
+                if not ids:
+                    del self.postings[gram]
+
+    def update(self, book):
+        self.add(book)
+
+    def candidates(self, query):
+        """Book ids whose fields may contain the (normalized) query"""
+        if self.last_query and self.last_query in query:
+            # Refining the previous query can only narrow its matches
+            return self.last_matches
+        grams = query_grams(query)
+        if not grams:
+            return self.documents.keys()
+        lists = []
+        for gram in grams:
+            ids = self.postings.get(gram)
+            if not ids:
+                return set()
+            lists.append(ids)
+        lists.sort(key=len)
+        result = set(lists[0])
+        for ids in lists[1:]:
+            result &= ids
+            if not result:
+                break
+        return result
+
+    @staticmethod
+    def score(query, fields):
+        """Match quality of a query against one book's fields (0 = no match)"""
+        title, filename, category = fields
+        position = title.find(query)
+        if position >= 0:
+            if title == query:
+                return 1000
+            if position == 0:
+                return max(701, 800 - len(title))
+            if not title[position - 1].isalnum():
+                return max(501, 600 - position)  # Start of a word
+            return max(301, 400 - position)
+        if query in filename:
+            return max(101, 200 - filename.find(query))
+        if query in category:
+            return 100
+        return 0
+
+    def search(self, query):
+        """Matching book ids, best match first"""
+        query = normalize_text(query).strip()
+        if not query:
+            return list(self.documents)
+        scored = []
+        for book_id in self.candidates(query):
+            fields = self.documents.get(book_id)
+            if fields is None:
+                continue
+            score = self.score(query, fields)
+            if score > 0:
+                scored.append((-score, fields[0], book_id))
+        scored.sort()
+        self.last_query = query
+        self.last_matches = [book_id for _, _, book_id in scored]
+        return list(self.last_matches)
@@ -0,0 +1,259 @@
+import tkinter as tk
+
+
+class ShelfTile:
+    """Canvas items for one book slot; recycled as the view scrolls"""
+    __slots__ = ('background', 'image', 'title', 'info', 'index', 'book')
+
+    def __init__(self, canvas):
+        self.background = canvas.create_rectangle(0, 0, 0, 0, fill='#404040', outline='#555555',
+                                                  width=1, state='hidden')
+        self.image = canvas.create_image(0, 0, anchor=tk.N, state='hidden')
+        self.title = canvas.create_text(0, 0, anchor=tk.N, fill='white', font=("Arial", 10, "bold"),
+                                        justify=tk.CENTER, state='hidden')
+        self.info = canvas.create_text(0, 0, anchor=tk.S, font=("Arial", 9), state='hidden')
+        self.index = None
+        self.book = None
+
+    def items(self):
+        return (self.background, self.image, self.title, self.info)
+
+
+class ShelfGrid:
+    """Book grid drawn directly on a canvas.
+
+    Only the rows in (or just around) the viewport get canvas items; tiles
+    are pooled and recycled on scroll, so redraw cost does not depend on the
+    size of the library. Mouse events are mapped to books with grid
+    arithmetic instead of per-widget bindings.
+    """
+
+    TILE_HEIGHT = 290      # Height of one tile including its padding
+    PAD = 10               # Gap around each tile
+    THUMB_HEIGHT = 200     # Thumbnail area height
+    OVERSCAN_ROWS = 1      # Extra rows kept drawn above/below the viewport
+
+    BG = '#404040'
+    HOVER_BG = '#505050'
+
+    def __init__(self, canvas, cols=5, get_thumbnail=None, get_status=None, callbacks=None):
+        self.canvas = canvas
+        self.cols = cols
+        self.get_thumbnail = get_thumbnail
+        self.get_status = get_status
+        self.callbacks = callbacks or {}
+
+        self.books = []
+        self.tiles = {}          # index -> ShelfTile
+        self.tile_by_book = {}   # book id -> ShelfTile
+        self.free_tiles = []
+        self.highlights = {}     # book id -> (fill, border width)
+        self.hover_id = None
+
+        self.placeholder = tk.PhotoImage(width=150, height=self.THUMB_HEIGHT)
+        self.placeholder.put('#666666', to=(0, 0, 150, self.THUMB_HEIGHT))
+
+        self.canvas.configure(yscrollincrement=20)
+        self.canvas.bind("<Configure>", lambda e: self.render(force=True))
+        self.canvas.bind("<MouseWheel>", self.on_mousewheel)
+        self.canvas.bind("<Button-4>", lambda e: self.scroll_units(-3))
+        self.canvas.bind("<Button-5>", lambda e: self.scroll_units(3))
+        self.canvas.bind("<Motion>", self.on_motion)
+        self.canvas.bind("<Leave>", lambda e: self.set_hover(None))
+
+        for sequence, name in (("<Button-1>", 'press'), ("<B1-Motion>", 'drag'),
+                               ("<ButtonRelease-1>", 'release'), ("<Double-Button-1>", 'double'),
+                               ("<Button-3>", 'context'), ("<Button-2>", 'middle')):
+            self.canvas.bind(sequence, lambda e, n=name: self.dispatch(n, e))
+
+    # ---- geometry -----------------------------------------------------------
+
+    @property
+    def column_width(self):
+        return max(1, self.canvas.winfo_width()) / self.cols
+
+    @property
+    def row_count(self):
+        return (len(self.books) + self.cols - 1) // self.cols
+
+    def tile_bounds(self, index):
+        """Canvas rectangle of the tile at the given position"""
+        row, col = divmod(index, self.cols)
+        col_width = self.column_width
+        x0 = col * col_width + self.PAD
+        y0 = row * self.TILE_HEIGHT + self.PAD
+        return x0, y0, x0 + col_width - 2 * self.PAD, y0 + self.TILE_HEIGHT - 2 * self.PAD
+
+    def index_at(self, x, y):
+        """Position of the tile under canvas coordinates (x, y), or None"""
+        col_width = self.column_width
+        col = int(x // col_width)
+        row = int(y // self.TILE_HEIGHT)
+        if x < 0 or y < 0 or col >= self.cols:
+            return None
+        local_x = x - col * col_width
+        local_y = y - row * self.TILE_HEIGHT
+        if not (self.PAD <= local_x <= col_width - self.PAD and
+                self.PAD <= local_y <= self.TILE_HEIGHT - self.PAD):
+            return None
+        index = row * self.cols + col
+        return index if index < len(self.books) else None
+
+    def book_at(self, event):
+        """Book under a canvas mouse event, or None"""
+        index = self.index_at(self.canvas.canvasx(event.x), self.canvas.canvasy(event.y))
+        return self.books[index] if index is not None else None
+
+    # ---- content ------------------------------------------------------------
+
+    def set_books(self, books):
+        """Show a new ordered list of books"""
+        self.books = list(books)
+        for tile in self.tiles.values():
+            tile.book = None  # Force a redraw of every reused tile
+        self.canvas.configure(scrollregion=(0, 0, self.canvas.winfo_width(),
+                                            self.row_count * self.TILE_HEIGHT))
+        self.render()
+
+    def update_tile(self, book_id):
+        """Redraw one book's tile if it is currently materialized"""
+        tile = self.tile_by_book.get(book_id)
+        if tile is not None:
+            self.draw_tile(tile, tile.index, tile.book)
+
+    def visible_range(self):
+        """Indexes of the books in or near the viewport"""
+        top = self.canvas.canvasy(0)
+        height = self.canvas.winfo_height()
+        first_row = max(0, int(top // self.TILE_HEIGHT) - self.OVERSCAN_ROWS)
+        last_row = int((top + height) // self.TILE_HEIGHT) + self.OVERSCAN_ROWS
+        return range(first_row * self.cols, min(len(self.books), (last_row + 1) * self.cols))
+
+    def visible_books(self):
+        return [self.books[i] for i in self.visible_range()]
+
+    def render(self, force=False):
+        """Materialize the tiles for the visible rows, recycling the rest"""
+        if self.canvas.winfo_width() <= 1:
+            return
+        if force:
+            self.canvas.configure(scrollregion=(0, 0, self.canvas.winfo_width(),
+                                                self.row_count * self.TILE_HEIGHT))
+            for tile in self.tiles.values():
+                tile.book = None
+
+        wanted = self.visible_range()
+        for index in [i for i in self.tiles if i not in wanted]:
+            self.release_tile(self.tiles.pop(index))
+
+        for index in wanted:
+            book = self.books[index]
+            tile = self.tiles.get(index)
+            if tile is None:
+                tile = self.free_tiles.pop() if self.free_tiles else ShelfTile(self.canvas)
+                self.tiles[index] = tile
+            if tile.book is not book or tile.index != index:
+                self.draw_tile(tile, index, book)
+
+        viewport = self.callbacks.get('viewport')
+        if viewport is not None:
+            viewport([self.books[i]['id'] for i in wanted])
+
+    def release_tile(self, tile):
+        if tile.book is not None and self.tile_by_book.get(tile.book['id']) is tile:
+            del self.tile_by_book[tile.book['id']]
+        for item in tile.items():
+            self.canvas.itemconfigure(item, state='hidden')
+        tile.book = None
+        tile.index = None
+        self.free_tiles.append(tile)
+
+    def draw_tile(self, tile, index, book):
+        if tile.book is not None and self.tile_by_book.get(tile.book['id']) is tile:
+            del self.tile_by_book[tile.book['id']]
+        tile.index = index
+        tile.book = book
+        self.tile_by_book[book['id']] = tile
+
+        x0, y0, x1, y1 = self.tile_bounds(index)
+        center = (x0 + x1) / 2
+        canvas = self.canvas
+
+        canvas.coords(tile.background, x0, y0, x1, y1)
+        self.apply_tile_colors(tile)
+
+        photo = self.get_thumbnail(book) if self.get_thumbnail else None
+        canvas.coords(tile.image, center, y0 + 10)
+        canvas.itemconfigure(tile.image, image=photo or self.placeholder, state='normal')
+
+        title = book['title'][:30] + "..." if len(book['title']) > 30 else book['title']
+        canvas.coords(tile.title, center, y0 + 15 + self.THUMB_HEIGHT)
+        canvas.itemconfigure(tile.title, text=title, width=min(140, x1 - x0 - 10), state='normal')
+
+        text, color = self.get_status(book) if self.get_status else ("", '#cccccc')
+        canvas.coords(tile.info, center, y1 - 10)
+        canvas.itemconfigure(tile.info, text=text, fill=color, state='normal')
+
+    def apply_tile_colors(self, tile):
+        book_id = tile.book['id']
+        if book_id in self.highlights:
+            fill, width = self.highlights[book_id]
+        elif book_id == self.hover_id:
+            fill, width = self.HOVER_BG, 1
+        else:
+            fill, width = self.BG, 1
+        self.canvas.itemconfigure(tile.background, fill=fill, width=width, state='normal')
+
+    # ---- highlighting -------------------------------------------------------
+
+    def set_highlight(self, book_id, fill=None, width=1):
+        """Highlight (or with fill=None, un-highlight) one book's tile"""
+        if fill is None:
+            self.highlights.pop(book_id, None)
+        else:
+            self.highlights[book_id] = (fill, width)
+        tile = self.tile_by_book.get(book_id)
+        if tile is not None:
+            self.apply_tile_colors(tile)
+
+    def clear_highlights(self, keep=None):
+        for book_id in list(self.highlights):
+            if book_id != keep:
+                self.set_highlight(book_id, None)
+
+    def set_hover(self, book_id):
+        previous, self.hover_id = self.hover_id, book_id
+        for changed in (previous, book_id):
+            tile = self.tile_by_book.get(changed) if changed else None
+            if tile is not None:
+                self.apply_tile_colors(tile)
+
+    # ---- events -------------------------------------------------------------
+
+    def yview(self, *args):
+        """Scrollbar command: scroll, then materialize the newly visible rows"""
+        self.canvas.yview(*args)
+        self.render()
+
+    def scroll_units(self, units):
+        self.canvas.yview_scroll(units, "units")
+        self.render()
+
+    def on_mousewheel(self, event):
+        self.scroll_units(int(-1 * (event.delta / 120)))
+
+    def on_motion(self, event):
+        book = self.book_at(event)
+        book_id = book['id'] if book else None
+        if book_id != self.hover_id:
+            self.set_hover(book_id)
+
+    def dispatch(self, name, event):
+        """Resolve the book under the pointer and forward to the shelf handler"""
+        callback = self.callbacks.get(name)
+        if callback is None:
+            return
+        book = self.book_at(event)
+        # Drag motion/release must reach the shelf even away from any tile
+        if book is not None or name in ('drag', 'release'):
+            callback(event, book)
@@ -0,0 +1,210 @@
+import os
+import io
+import base64
+import mmap
+import zlib
+import threading
+from PIL import Image
+
+
+def image_to_ppm(image):
+    """Binary PPM bytes of a PIL image (the format Tk's PhotoImage decodes natively)"""
+    buffer = io.BytesIO()
+    image.convert('RGB').save(buffer, "PPM")
+    return buffer.getvalue()
+
+
+def png_to_ppm(png_data):
+    return image_to_ppm(Image.open(io.BytesIO(png_data)))
+
+
+def ppm_to_png(ppm_data):
+    buffer = io.BytesIO()
+    Image.open(io.BytesIO(ppm_data)).save(buffer, "PNG", optimize=True)
+    return buffer.getvalue()
+
+
+PREVIEW_GRID = (4, 6)  # Columns x rows of the inline cover preview
+
+
+def make_cover_preview(image):
+    """Compact "WxH:<base64 RGB grid>" summary of a thumbnail, stored in the book record"""
+    grid = image.convert('RGB').resize(PREVIEW_GRID, Image.Resampling.BOX)
+    return f"{image.width}x{image.height}:" + base64.b64encode(grid.tobytes()).decode('ascii')
+
+
+def cover_preview_image(preview):
+    """Blurred thumbnail-sized PIL image rebuilt from a cover preview string"""
+    size, data = preview.split(':', 1)
+    width, height = (int(value) for value in size.split('x'))
+    grid = Image.frombytes('RGB', PREVIEW_GRID, base64.b64decode(data))
+    return grid.resize((width, height), Image.Resampling.BILINEAR)
+
+
+class ThumbnailPack:
+    """All thumbnails in one append-only, memory-mapped data file.
+
+    Each record is a zlib-compressed PPM image; decompressing a slice of the
+    map gives bytes tk.PhotoImage(data=...) accepts directly, so showing a
+    thumbnail costs no file open/stat/PNG decode. The companion .idx file is
+    an append-only log of "book_id offset length" lines (length -1 marks a
+    removal); the last line for an id wins. Replaced and removed records
+    become garbage that compact() reclaims.
+    """
+
+    COMPRESS_LEVEL = 1  # Thumbnails are small; favour speed over size
+
+    def __init__(self, pack_path):
+        self.pack_path = pack_path
+        self.index_path = pack_path + ".idx"
+        self.lock = threading.RLock()
+        os.makedirs(os.path.dirname(pack_path), exist_ok=True)
+        self.entries = {}  # book_id -> (offset, length)
+        self.garbage = 0   # Bytes of superseded records
+        self.map = None
+        self.open()
+
+    def open(self):
+        self.data_file = open(self.pack_path, 'a+b')
+        self.data_size = os.path.getsize(self.pack_path)
+        self.load_index()
+        self.index_file = open(self.index_path, 'a', encoding='utf-8')
+        self.remap()
+
+    def load_index(self):
+        self.entries = {}
+        self.garbage = 0
+        if not os.path.exists(self.index_path):
+            return
+        with open(self.index_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) != 3:
+                    continue  # Torn last line after a crash
+                book_id, offset, length = parts[0], int(parts[1]), int(parts[2])
+                previous = self.entries.pop(book_id, None)
+                if previous:
+                    self.garbage += previous[1]
+                if length >= 0 and offset + length <= self.data_size:
+                    self.entries[book_id] = (offset, length)
+
+    def remap(self):
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+        if self.data_size > 0:
+            self.map = mmap.mmap(self.data_file.fileno(), self.data_size, access=mmap.ACCESS_READ)
+
+    def close(self):
+        with self.lock:
+            if self.map is not None:
+                self.map.close()
+                self.map = None
+            self.data_file.close()
+            self.index_file.close()
+
+    def __contains__(self, book_id):
+        return book_id in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    @property
+    def size(self):
+        return self.data_size
+
+    def get(self, book_id):
+        """PPM bytes for a book, or None"""
+        with self.lock:
+            entry = self.entries.get(book_id)
+            if entry is None:
+                return None
+            offset, length = entry
+            if self.map is None or offset + length > len(self.map):
+                self.remap()
+            try:
+                return zlib.decompress(self.map[offset:offset + length])
+            except zlib.error as e:
+                print(f"Corrupt thumbnail record for {book_id}: {e}")
+                return None
+
+    def put(self, book_id, ppm_data):
+        """Append a thumbnail, superseding any earlier one for the book"""
+        record = zlib.compress(ppm_data, self.COMPRESS_LEVEL)
+        with self.lock:
+            offset = self.data_size
+            self.data_file.seek(0, os.SEEK_END)
+            self.data_file.write(record)
+            self.data_file.flush()
+            self.data_size += len(record)
+            self.log(book_id, offset, len(record))
+            previous = self.entries.get(book_id)
+            if previous:
+                self.garbage += previous[1]
+            self.entries[book_id] = (offset, len(record))
+            # The map is grown lazily by the next get()
+
+    def remove(self, book_id):
+        with self.lock:
+            previous = self.entries.pop(book_id, None)
+            if previous:
+                self.garbage += previous[1]
+                self.log(book_id, 0, -1)
+
+    def log(self, book_id, offset, length):
+        self.index_file.write(f"{book_id} {offset} {length}\n")
+        self.index_file.flush()
+
+    def needs_compaction(self, keep_ids=None):
+        """True if removed books or superseded records waste a worthwhile share of the file"""
+        if keep_ids is not None and any(book_id not in keep_ids for book_id in self.entries):
+            return True
+        return self.garbage > 1024 * 1024 and self.garbage * 4 > self.data_size
+
+    def compact(self, keep_ids=None):
+        """Rewrite the pack with only live records (optionally only those in keep_ids)"""
+        with self.lock:
+            temp_pack = self.pack_path + ".tmp"
+            temp_index = self.index_path + ".tmp"
+            if self.map is None or len(self.map) < self.data_size:
+                self.remap()
+            with open(temp_pack, 'wb') as pack, open(temp_index, 'w', encoding='utf-8') as index:
+                offset = 0
+                for book_id, (old_offset, length) in self.entries.items():
+                    if keep_ids is not None and book_id not in keep_ids:
+                        continue
+                    pack.write(self.map[old_offset:old_offset + length])
+                    index.write(f"{book_id} {offset} {length}\n")
+                    offset += length
+                pack.flush()
+                os.fsync(pack.fileno())
+
+            # Handles must be closed before replacing the files (Windows)
+            self.close()
+            os.replace(temp_pack, self.pack_path)
+            os.replace(temp_index, self.index_path)
+            self.open()
+
+    def migrate_png_dir(self, thumbnails_dir):
+        """Move the old one-PNG-per-book thumbnails into the pack; returns the count"""
+        if not os.path.isdir(thumbnails_dir):
+            return 0
+        migrated = 0
+        for name in os.listdir(thumbnails_dir):
+            book_id, ext = os.path.splitext(name)
+            if ext.lower() != '.png':
+                continue
+            path = os.path.join(thumbnails_dir, name)
+            try:
+                if book_id not in self.entries:
+                    with Image.open(path) as image:
+                        self.put(book_id, image_to_ppm(image))
+                    migrated += 1
+                os.remove(path)
+            except Exception as e:
+                print(f"Error migrating thumbnail {name}: {e}")
+        try:
+            os.rmdir(thumbnails_dir)
+        except OSError:
+            pass  # Not empty (unreadable files are left in place)
+        return migrated
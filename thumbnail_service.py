@@ -0,0 +1,156 @@
+import os
+import io
+import heapq
+import itertools
+import queue
+from concurrent.futures import ProcessPoolExecutor
+
+
+def render_thumbnail(pdf_path, page_num):
+    """Rasterize one PDF page to (thumbnail PPM bytes, cover preview) in a worker process"""
+    import fitz  # PyMuPDF
+    from PIL import Image
+    from thumbnail_pack import image_to_ppm, make_cover_preview
+
+    try:
+        # Open PDF and get specified page
+        doc = fitz.open(pdf_path)
+        if len(doc) == 0:
+            doc.close()
+            return None
+
+        # Ensure page number is valid
+        page_num = max(0, min(page_num, len(doc) - 1))
+        page = doc[page_num]
+
+        # Use lower resolution for faster generation
+        mat = fitz.Matrix(0.3, 0.3)  # Reduced scale for faster processing
+        pix = page.get_pixmap(matrix=mat)
+
+        # Convert to PIL Image
+        img_data = pix.tobytes("ppm")
+        pil_image = Image.open(io.BytesIO(img_data))
+
+        # Resize to standard thumbnail size
+        pil_image.thumbnail((150, 200), Image.Resampling.LANCZOS)
+        doc.close()
+
+        return image_to_ppm(pil_image), make_cover_preview(pil_image)
+
+    except Exception as e:
+        print(f"Error generating thumbnail for {os.path.basename(pdf_path)}: {e}")
+        # Use a default placeholder image
+        try:
+            return image_to_ppm(Image.new('RGB', (150, 200), '#666666')), None
+        except Exception:
+            return None
+
+
+class ThumbnailScheduler:
+    """Bounded, prioritized thumbnail generation on a process pool.
+
+    Requests are deduplicated per book and kept in a priority queue where
+    books visible in the shelf viewport come first. At most one job per
+    worker is handed to the pool at a time, so reprioritizing and
+    cancelling stay effective. Finished thumbnails are delivered to the Tk
+    thread in batches of (book_id, (ppm_bytes, cover_preview)) by a single
+    after() pump; all scheduler state is only touched on the Tk thread.
+    """
+
+    VISIBLE = 0
+    BACKGROUND = 1
+
+    def __init__(self, root, on_ready, workers=None):
+        self.root = root
+        self.on_ready = on_ready
+        self.workers = workers or max(1, min(4, (os.cpu_count() or 2) - 1))
+        self.executor = ProcessPoolExecutor(max_workers=self.workers)
+
+        self.heap = []        # (priority, sequence, book_id)
+        self.jobs = {}        # book_id -> (pdf_path, page_num, priority)
+        self.in_flight = {}   # book_id -> Future
+        self.front = set()    # Queued book ids at VISIBLE priority
+        self.done = queue.Queue()  # (book_id, Future) from pool callback threads
+        self.sequence = itertools.count()
+        self.running = True
+
+        self.root.after(50, self.pump)
+
+    def request(self, book_id, pdf_path, page_num, visible=False):
+        """Queue a thumbnail; repeated requests for the same book only raise its priority"""
+        priority = self.VISIBLE if visible else self.BACKGROUND
+        job = self.jobs.get(book_id)
+        if book_id in self.in_flight and job is None:
+            return
+        if job is not None and job[2] <= priority:
+            return
+        self.set_priority(book_id, (pdf_path, page_num), priority)
+
+    def set_priority(self, book_id, job, priority):
+        self.jobs[book_id] = job + (priority,)
+        if priority == self.VISIBLE:
+            self.front.add(book_id)
+        else:
+            self.front.discard(book_id)
+        # The old heap entry is skipped in dispatch() as stale
+        heapq.heappush(self.heap, (priority, next(self.sequence), book_id))
+
+    def prioritize(self, visible_ids):
+        """Put queued books in the viewport first and demote ones scrolled away"""
+        visible_ids = set(visible_ids)
+        for book_id in self.front - visible_ids:
+            self.set_priority(book_id, self.jobs[book_id][:2], self.BACKGROUND)
+        for book_id in visible_ids - self.front:
+            job = self.jobs.get(book_id)
+            if job is not None:
+                self.set_priority(book_id, job[:2], self.VISIBLE)
+
+    def cancel(self, book_id):
+        """Forget a queued request and drop the result of a running one"""
+        self.jobs.pop(book_id, None)
+        self.front.discard(book_id)
+        future = self.in_flight.pop(book_id, None)
+        if future is not None:
+            future.cancel()
+
+    def dispatch(self):
+        while self.heap and len(self.in_flight) < self.workers:
+            priority, _, book_id = heapq.heappop(self.heap)
+            job = self.jobs.get(book_id)
+            if job is None or job[2] != priority or book_id in self.in_flight:
+                continue  # Stale heap entry
+            del self.jobs[book_id]
+            self.front.discard(book_id)
+            pdf_path, page_num, _ = job
+            future = self.executor.submit(render_thumbnail, pdf_path, page_num)
+            self.in_flight[book_id] = future
+            future.add_done_callback(lambda f, b=book_id: self.done.put((b, f)))
+
+    def pump(self):
+        """Deliver finished thumbnails in one batch and keep the pool busy"""
+        if not self.running:
+            return
+        ready = []
+        while True:
+            try:
+                book_id, future = self.done.get_nowait()
+            except queue.Empty:
+                break
+            if self.in_flight.get(book_id) is not future:
+                continue  # Cancelled or superseded
+            del self.in_flight[book_id]
+            if future.cancelled() or future.exception() is not None:
+                continue
+            if future.result():
+                ready.append((book_id, future.result()))
+
+        if ready:
+            self.on_ready(ready)
+        self.dispatch()
+
+        busy = self.in_flight or self.heap
+        self.root.after(50 if busy else 250, self.pump)
+
+    def shutdown(self):
+        self.running = False
+        self.executor.shutdown(wait=False, cancel_futures=True)